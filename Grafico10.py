@@ -1,31 +1,86 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load and preprocess
-df = pd.read_csv(r"C:\Users\FabiodosSantosPrumuc\Desktop\meusdatasets\Datasets\CPI_MONTHLY.csv")
-df['date'] = pd.to_datetime(df['date'])
-df = df[df['date'].dt.year >= 1997]
-df['quarter'] = df['date'].dt.to_period('Q')
-df_quarterly = df.groupby('quarter')[['STATIC_TOTALCPICHANGE', 'CPI_TRIM', 'CPI_MEDIAN', 'CPI_COMMON']].mean().reset_index()
-df_quarterly['quarter'] = df_quarterly['quarter'].dt.to_timestamp()
-
-# Plot
-plt.figure(figsize=(14, 6))
-sns.lineplot(data=df_quarterly, x='quarter', y='STATIC_TOTALCPICHANGE', label='Total CPI')
-sns.lineplot(data=df_quarterly, x='quarter', y='CPI_TRIM', label='Trimmed CPI')
-sns.lineplot(data=df_quarterly, x='quarter', y='CPI_MEDIAN', label='Median CPI')
-sns.lineplot(data=df_quarterly, x='quarter', y='CPI_COMMON', label='Common CPI')
-
-# Highlight crises
-plt.axvspan(pd.to_datetime('2008-07-01'), pd.to_datetime('2010-12-31'), color='red', alpha=0.1, label='2008–2009 Crisis')
-plt.axvspan(pd.to_datetime('2020-01-01'), pd.to_datetime('2021-12-31'), color='orange', alpha=0.1, label='COVID-19 Crisis')
-
-# Formatting
-plt.title('Inflation Trends During Global Crises (Canada)', fontsize=14)
-plt.xlabel('Year')
-plt.ylabel('Inflation Rate (%)')
-plt.grid(True)
-plt.legend(title='CPI Measure', loc='upper left')
-plt.tight_layout()
-plt.show()
+
+from change_points import update_breaks
+from line_plot import plot_lines
+from pipeline import compute
+from quarters import quarter_to_timestamp, to_ordinal
+
+# Datasets required by this chart (render_all.py loads each one once and shares it)
+DATASETS = ['cpi_quarterly', 'rmpi_breaks']
+
+# Crisis windows shaded when the detector finds none in the CPI range:
+# (first quarter, last quarter, label) as quarter ordinals
+BASELINE_CRISES = (
+    (to_ordinal(2008, 3), to_ordinal(2010, 4), '2008–2009 Crisis'),
+    (to_ordinal(2020, 1), to_ordinal(2021, 4), 'COVID-19 Crisis'),
+)
+# Colors of the baseline or explicitly given crisis windows, in order
+CRISIS_COLORS = ['red', 'orange', 'green', 'purple']
+
+
+def crisis_windows(cpi_quarterly, rmpi_breaks, crises=None, min_share=0.25, min_width=6):
+    """(windows, detected): the (first quarter, last quarter, label) windows to shade.
+
+    Unless `crises` gives them, the windows are the raw-material price shocks found by the
+    change-point detector (see ChangePointDetector.intervals) within the CPI range, or
+    BASELINE_CRISES if it finds none there.
+    """
+    if crises is not None:
+        return list(crises), False
+    first, last = cpi_quarterly['QUARTER'].min(), cpi_quarterly['QUARTER'].max()
+    detected = [(start, end, 'Raw-material price shock (detected)')
+                for start, end in rmpi_breaks.intervals(min_share, min_width=min_width)
+                if end >= first and start <= last]
+    return (detected, True) if detected else (list(BASELINE_CRISES), False)
+
+
+def chart_data(cpi_quarterly, rmpi_breaks, crises=None, min_share=0.25, min_width=6):
+    """Quarterly averages of the CPI measures with a flag for the shaded crisis quarters."""
+    shock = pd.Series(False, index=cpi_quarterly.index)
+    for start, end, _ in crisis_windows(cpi_quarterly, rmpi_breaks, crises, min_share, min_width)[0]:
+        shock |= cpi_quarterly['QUARTER'].between(start, end)
+    return cpi_quarterly.assign(crisis=shock)
+
+
+def build_chart(cpi_quarterly, rmpi_breaks, crises=None, min_share=0.25, min_width=6):
+    """Quarterly CPI measures with crisis windows highlighted (see crisis_windows)."""
+    # Preprocess
+    df_quarterly = cpi_quarterly.assign(quarter=quarter_to_timestamp(cpi_quarterly['QUARTER']))
+
+    # Plot
+    fig = plt.figure(figsize=(14, 6))
+    plot_lines(
+        plt.gca(),
+        df_quarterly['quarter'],
+        df_quarterly[['STATIC_TOTALCPICHANGE', 'CPI_TRIM', 'CPI_MEDIAN', 'CPI_COMMON']].to_numpy().T,
+        labels=['Total CPI', 'Trimmed CPI', 'Median CPI', 'Common CPI']
+    )
+
+    # Highlight crises
+    # Each window spans from the start of its first quarter to the end of its last one;
+    # detected windows share one color and one legend entry
+    windows, detected = crisis_windows(cpi_quarterly, rmpi_breaks, crises, min_share, min_width)
+    for i, (first, last, label) in enumerate(windows):
+        start, end = quarter_to_timestamp([first, last + 1])
+        color = 'red' if detected else CRISIS_COLORS[i % len(CRISIS_COLORS)]
+        plt.axvspan(start, end, color=color, alpha=0.1, label=label if not (detected and i) else None)
+
+    # Formatting
+    if detected:
+        plt.title('Inflation Trends During Raw-Material Price Shocks (Canada)', fontsize=14)
+    else:
+        plt.title('Inflation Trends During Global Crises (Canada)', fontsize=14)
+    plt.xlabel('Year')
+    plt.ylabel('Inflation Rate (%)')
+    plt.grid(True)
+    plt.legend(title='CPI Measure', loc='upper left')
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    # Load
+    # Raw-material price breaks are detected incrementally on the RMPI vector panel
+    build_chart(compute('cpi_quarterly'), update_breaks('rmpi'))
+    plt.show()
@@ -0,0 +1,54 @@
+# Import libraries for the correlation analysis and the heatmap
+import matplotlib.pyplot as plt
+
+from lag_correlation import correlate_panel
+from pipeline import compute
+from vector_panel import load_panel
+
+# Datasets required by this chart (render_all.py loads each one once and shares it)
+DATASETS = ['rmpi_panel', 'cpi_quarterly']
+
+
+def _correlations(rmpi_panel, cpi_quarterly, max_lag):
+    # Year-over-year change of each raw material's pooled quarterly price index, correlated
+    # with every CPI measure from -max_lag to +max_lag quarters in one vectorized pass
+    return correlate_panel(rmpi_panel, cpi_quarterly, max_lag=max_lag,
+                           by='North American Product Classification System (NAPCS)')
+
+
+def chart_data(rmpi_panel, cpi_quarterly, top_n=15, max_lag=8, measure='STATIC_TOTALCPICHANGE'):
+    """Lagged correlations of the `top_n` raw materials most correlated with a CPI measure."""
+    result = _correlations(rmpi_panel, cpi_quarterly, max_lag)
+    correlations = result.to_long()
+    return correlations[correlations['series'].isin(result.top(measure, top_n))].reset_index(drop=True)
+
+
+def build_chart(rmpi_panel, cpi_quarterly, top_n=15, max_lag=8, measure='STATIC_TOTALCPICHANGE'):
+    """Heatmap of the correlation between RMPI price changes and CPI inflation by lag."""
+    # === CORRELATION ANALYSIS ===
+    # Keep the raw materials whose strongest correlation (at any lag) is the largest
+    result = _correlations(rmpi_panel, cpi_quarterly, max_lag)
+    top_products = result.top(measure, top_n)
+    matrix = result.matrix(measure)[[result.labels.index(product) for product in top_products]]
+
+    # === DATA VISUALIZATION ===
+    # Rows are raw materials, columns are lags; red means prices and inflation move together
+    fig, ax = plt.subplots(figsize=(14, max(4, 0.4 * len(top_products) + 2)))
+    image = ax.imshow(matrix, cmap='RdBu_r', vmin=-1, vmax=1, aspect='auto',
+                      extent=(result.lags[0] - 0.5, result.lags[-1] + 0.5, len(top_products) - 0.5, -0.5))
+    ax.set_yticks(range(len(top_products)))
+    ax.set_yticklabels(top_products, fontsize=8)
+    fig.colorbar(image, ax=ax, label='Correlation')
+
+    # Formatting
+    ax.set_title(f'RMPI Year-over-Year Price Change vs {measure}: Lagged Correlation', fontsize=14)
+    ax.set_xlabel('Lag in quarters (positive: raw material prices lead inflation)')
+    ax.set_ylabel('Raw Material')
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    # Load the RMPI vector panel and the quarterly CPI measures
+    build_chart(load_panel('rmpi'), compute('cpi_quarterly'))
+    plt.show()
@@ -1,67 +1,74 @@
 # Import core libraries for data manipulation and visualization
-import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-
-# === DATA INGESTION ===
-# Load the Raw Materials Price Index (RMPI) dataset from Statistics Canada
-# The dataset includes quarterly price indices for a variety of raw materials critical to the Canadian economy
-df = pd.read_csv(
-    r"C:\Users\FabiodosSantosPrumuc\Desktop\meusdatasets\18100268-RAW_QuarterNormal.csv",
-    encoding='latin1',
-    low_memory=False
-)
-
-# === DATA CLEANING ===
-# Standardize column names and remove potential byte order marks (BOM)
-df.columns = df.columns.str.strip().str.replace('\ufeff', '', regex=True)
-
-# Convert reference date column to datetime object for time series plotting
-df['REF_DATE'] = pd.PeriodIndex(df['REF_DATE'], freq='Q').to_timestamp()
-
-# Drop entries with missing values in key analytical columns
-df = df.dropna(subset=['VALUE', 'North American Product Classification System (NAPCS)'])
-
-# === VARIATION ANALYSIS ===
-# Group data by product category and calculate minimum and maximum price index values
-# Then compute the range (i.e., price variation) for each product
-variation = df.groupby(
-    'North American Product Classification System (NAPCS)'
-)['VALUE'].agg(['min', 'max'])
-variation['range'] = variation['max'] - variation['min']
-
-# Identify the top 5 products with the highest price variation
-top_products = variation.sort_values('range', ascending=False).head(5).index.tolist()
-
-# Filter the main dataset to include only those top 5 volatile products
-df_top = df[df['North American Product Classification System (NAPCS)'].isin(top_products)]
-
-# Group filtered data by time and product category to compute mean price index per quarter
-df_grouped = df_top.groupby(
-    ['REF_DATE', 'North American Product Classification System (NAPCS)']
-)['VALUE'].mean().reset_index()
-
-# === DATA VISUALIZATION ===
-# Line plot to visualize the quarterly price evolution of the most volatile raw materials
-# Helps identify which materials are most prone to economic pressure
-
-plt.figure(figsize=(14, 6))
-sns.lineplot(
-    data=df_grouped,
-    x='REF_DATE',
-    y='VALUE',
-    hue='North American Product Classification System (NAPCS)'
-)
-
-# Chart formatting for academic presentation
-plt.title('Graph 2 – RMPI: Top 5 Raw Materials with Highest Price Variation', fontsize=14)
-plt.xlabel('Quarter')
-plt.ylabel('Price Index (2020 = 100)')
-plt.xticks(rotation=45)
-plt.grid(True)
-plt.legend(title='Raw Material')
-plt.tight_layout()
-plt.show()
-
-# Pause to allow chart inspection when run in command-line interface
-input("✅ Pressione Enter to close the chart...")
+
+from facets import FACETS, facet_data, facet_figure
+from line_plot import plot_lines
+from vector_panel import load_panel
+from volatility import top_volatile
+
+# Datasets required by this chart (render_all.py loads each one once and shares it)
+DATASETS = ['rmpi_panel']
+
+
+def _top_series(rmpi_panel, top_n, metric='row_range'):
+    # === VARIATION ANALYSIS ===
+    # Rank products by the price range (max - min) of their source rows with the shared
+    # volatility engine and identify the top 5 products with the highest price variation
+    # (metric='range', 'std', 'cv', 'max_drawdown' or 'rolling_vol' rank the quarterly mean
+    # index instead)
+    top_products = top_volatile(rmpi_panel, k=top_n, metric=metric)
+
+    # Take the mean price index per quarter of those top 5 volatile products from the panel
+    # (one row per product over the quarter axis, NaN where a product has no data)
+    return rmpi_panel.group_mean(groups=top_products)
+
+
+def chart_data(rmpi_panel, top_n=5, metric='row_range'):
+    """Quarterly mean price index of the `top_n` most volatile raw materials (long format)."""
+    return rmpi_panel.to_long(*_top_series(rmpi_panel, top_n, metric))
+
+
+def build_chart(rmpi_panel, top_n=5, facet=None, metric='row_range'):
+    """Graph 2 – RMPI raw materials with the highest price variation.
+
+    facet='GEO' (or 'NAPCS') draws small multiples, one panel per region (or product).
+    """
+    if facet is not None:
+        # === SMALL MULTIPLES ===
+        # The same top products, pooled per facet, on panels with shared axes
+        facet_labels, labels, array = facet_data(rmpi_panel, FACETS[facet], top_n, metric)
+        return facet_figure(rmpi_panel.timestamps(), array, facet_labels, labels,
+                            title=f'Graph 2 – RMPI: Top {top_n} Raw Materials with Highest Price Variation by {"Region" if facet == "GEO" else "Product"}',
+                            legend_title='Region' if facet == 'NAPCS' else 'Raw Material')
+
+    labels, matrix = _top_series(rmpi_panel, top_n, metric)
+
+    # === DATA VISUALIZATION ===
+    # Line plot to visualize the quarterly price evolution of the most volatile raw materials
+    # Helps identify which materials are most prone to economic pressure
+
+    # All products are drawn in one call over the quarter timestamps, most volatile first
+    fig = plt.figure(figsize=(14, 6))
+    plot_lines(plt.gca(), rmpi_panel.timestamps(), matrix, labels)
+
+    # Chart formatting for academic presentation
+    plt.title(f'Graph 2 – RMPI: Top {top_n} Raw Materials with Highest Price Variation', fontsize=14)
+    plt.xlabel('Quarter')
+    plt.ylabel('Price Index (2020 = 100)')
+    plt.xticks(rotation=45)
+    plt.grid(True)
+    plt.legend(title='Raw Material')
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    # === DATA INGESTION ===
+    # Load the Raw Materials Price Index (RMPI) dataset from Statistics Canada
+    # The dataset includes quarterly price indices for a variety of raw materials critical to the Canadian economy
+    # Each price series is read from the memory-mapped vector x quarter panel
+    build_chart(load_panel('rmpi'))
+    plt.show()
+
+    # Pause to allow chart inspection when run in command-line interface
+    input("✅ Pressione Enter to close the chart...")
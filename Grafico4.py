@@ -1,69 +1,73 @@
 # Import libraries for data manipulation and visualization
-import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-
-# === DATA INGESTION ===
-# Load the Industrial Product Price Index (IPPI) dataset from Statistics Canada
-# The dataset tracks price changes of manufactured goods sold by producers, covering various sectors
-df = pd.read_csv(
-    r"C:\Users\FabiodosSantosPrumuc\Desktop\meusdatasets\18100272-IPRI1203.csv",
-    encoding='latin1',
-    low_memory=False
-)
-
-# Handle BOM (byte order mark) if present in first column name
-if 'ï»¿REF_DATE' in df.columns:
-    df.rename(columns={'ï»¿REF_DATE': 'REF_DATE'}, inplace=True)
-
-# Standardize column names by stripping extra spaces
-df.columns = df.columns.str.strip()
-
-# Convert 'REF_DATE' to datetime format using quarterly conversion
-# This ensures compatibility with time series visualization
-df['REF_DATE'] = pd.PeriodIndex(df['REF_DATE'], freq='Q').to_timestamp()
-
-# Remove rows with missing key data (product name or value)
-df = df.dropna(subset=['VALUE', 'North American Product Classification System (NAPCS)'])
-
-# === VARIATION ANALYSIS ===
-# Calculate price range (max - min) for each product across time
-variation = df.groupby(
-    'North American Product Classification System (NAPCS)'
-)['VALUE'].agg(['max', 'min'])
-variation['range'] = variation['max'] - variation['min']
-
-# Identify top 5 products with highest price fluctuation (i.e., volatility)
-top_products = variation.sort_values('range', ascending=False).head(5).index.tolist()
-
-# Filter dataset to retain only the most volatile products
-df_top = df[df['North American Product Classification System (NAPCS)'].isin(top_products)]
-
-# Group data by time and product to compute the mean index value per quarter
-df_grouped = df_top.groupby(
-    ['REF_DATE', 'North American Product Classification System (NAPCS)']
-)['VALUE'].mean().reset_index()
-
-# === DATA VISUALIZATION ===
-# Line plot showing how price indices evolved over time for the selected products
-
-plt.figure(figsize=(14, 6))
-sns.lineplot(
-    data=df_grouped,
-    x='REF_DATE',
-    y='VALUE',
-    hue='North American Product Classification System (NAPCS)'
-)
-
-# Format chart with academic-style title and axis labels
-plt.title('IPPI Trends: Top 5 Industrial Products with Highest Price Variation', fontsize=14)
-plt.xlabel('Quarter')
-plt.ylabel('Price Index (2020=100)')
-plt.xticks(rotation=45)
-plt.grid(True)
-plt.legend(title='Industrial Product')
-plt.tight_layout()
-plt.show()
-
-# Optional pause for CLI environments
-input("✅ Pressione Enter para fechar o gráfico...")
+
+from facets import FACETS, facet_data, facet_figure
+from line_plot import plot_lines
+from vector_panel import load_panel
+from volatility import top_volatile
+
+# Datasets required by this chart (render_all.py loads each one once and shares it)
+DATASETS = ['ippi_panel']
+
+
+def _top_series(ippi_panel, top_n, metric='row_range'):
+    # === VARIATION ANALYSIS ===
+    # Rank products by the price range (max - min) of their source rows with the shared
+    # volatility engine and identify the top 5 products with the highest price variation
+    # (metric='range', 'std', 'cv', 'max_drawdown' or 'rolling_vol' rank the quarterly mean
+    # index instead)
+    top_products = top_volatile(ippi_panel, k=top_n, metric=metric)
+
+    # Take the mean price index per quarter of those top 5 volatile products from the panel
+    # (one row per product over the quarter axis, NaN where a product has no data)
+    return ippi_panel.group_mean(groups=top_products)
+
+
+def chart_data(ippi_panel, top_n=5, metric='row_range'):
+    """Quarterly mean price index of the `top_n` most volatile industrial products (long format)."""
+    return ippi_panel.to_long(*_top_series(ippi_panel, top_n, metric))
+
+
+def build_chart(ippi_panel, top_n=5, facet=None, metric='row_range'):
+    """IPPI industrial products with the highest price variation.
+
+    facet='GEO' (or 'NAPCS') draws small multiples, one panel per region (or product).
+    """
+    if facet is not None:
+        # === SMALL MULTIPLES ===
+        # The same top products, pooled per facet, on panels with shared axes
+        facet_labels, labels, array = facet_data(ippi_panel, FACETS[facet], top_n, metric)
+        return facet_figure(ippi_panel.timestamps(), array, facet_labels, labels,
+                            title=f'IPPI Trends: Top {top_n} Industrial Products with Highest Price Variation by {"Region" if facet == "GEO" else "Product"}',
+                            legend_title='Region' if facet == 'NAPCS' else 'Industrial Product')
+
+    labels, matrix = _top_series(ippi_panel, top_n, metric)
+
+    # === DATA VISUALIZATION ===
+    # Line plot showing how price indices evolved over time for the selected products
+
+    # All products are drawn in one call over the quarter timestamps, most volatile first
+    fig = plt.figure(figsize=(14, 6))
+    plot_lines(plt.gca(), ippi_panel.timestamps(), matrix, labels)
+
+    # Format chart with academic-style title and axis labels
+    plt.title(f'IPPI Trends: Top {top_n} Industrial Products with Highest Price Variation', fontsize=14)
+    plt.xlabel('Quarter')
+    plt.ylabel('Price Index (2020=100)')
+    plt.xticks(rotation=45)
+    plt.grid(True)
+    plt.legend(title='Industrial Product')
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    # === DATA INGESTION ===
+    # Load the Industrial Product Price Index (IPPI) dataset from Statistics Canada
+    # The dataset tracks price changes of manufactured goods sold by producers, covering various sectors
+    # Each price series is read from the memory-mapped vector x quarter panel
+    build_chart(load_panel('ippi'))
+    plt.show()
+
+    # Optional pause for CLI environments
+    input("✅ Pressione Enter para fechar o gráfico...")
@@ -1,57 +1,64 @@
 # Import libraries for data handling and time series visualization
-import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-
-# === DATA INGESTION ===
-# Load the quarterly GDP dataset from Statistics Canada
-# The dataset contains GDP values by industry sector, adjusted for inflation (chained 2017 dollars)
-df = pd.read_csv(
-    r"C:\Users\FabiodosSantosPrumuc\Desktop\meusdatasets\36100434.csv",
-    encoding='latin1',
-    low_memory=False
-)
-
-# Handle broken column name if present (caused by encoding artifacts)
-if 'ï»¿REF_DATE' in df.columns:
-    df.rename(columns={'ï»¿REF_DATE': 'REF_DATE'}, inplace=True)
-
-# Convert quarterly string values (e.g., '1997Q1') into timestamp format for plotting
-df['REF_DATE'] = pd.PeriodIndex(df['REF_DATE'], freq='Q').to_timestamp()
-
-# Remove rows where the GDP value is missing
-df = df.dropna(subset=['VALUE'])
-
-# === SECTOR RANKING ===
-# Group by sector and calculate total GDP contribution over time
-# Identify the top 3 industry sectors based on cumulative economic output
-top_sectors = df.groupby('North American Industry Classification System (NAICS)')['VALUE'].sum().nlargest(3).index.tolist()
-
-# Filter dataset to retain only those top 3 sectors
-df_top = df[df['North American Industry Classification System (NAICS)'].isin(top_sectors)]
-
-# Aggregate quarterly GDP values per sector
-df_grouped = df_top.groupby(
-    ['REF_DATE', 'North American Industry Classification System (NAICS)']
-)['VALUE'].sum().reset_index()
-
-# === DATA VISUALIZATION ===
-# Generate a multi-line plot to visualize the GDP trends of the top 3 sectors
-
-plt.figure(figsize=(14, 6))
-sns.lineplot(
-    data=df_grouped,
-    x='REF_DATE',
-    y='VALUE',
-    hue='North American Industry Classification System (NAICS)'
-)
-
-# Academic-style formatting for interpretability
-plt.title('Quarterly GDP of Top 3 Industry Sectors in Canada', fontsize=14)
-plt.xlabel('Quarter')
-plt.ylabel('GDP (in Millions, Chained 2017 Dollars)')
-plt.xticks(rotation=45)
-plt.grid(True)
-plt.legend(title='Industry Sector')
-plt.tight_layout()
-plt.show()
+
+from data_loader import NAICS
+from hierarchy import Hierarchy
+from line_plot import plot_frame
+from pipeline import compute
+from quarters import quarter_to_timestamp
+
+# Datasets required by this chart (render_all.py loads each one once and shares it)
+DATASETS = ['gdp_by_sector']
+
+
+def chart_data(gdp_by_sector, top_n=3):
+    """Quarterly GDP of the `top_n` industry sectors by cumulative output."""
+    # Quarterly GDP per sector without missing values (memoized 'gdp_by_sector' step)
+    df = gdp_by_sector
+
+    # === SECTOR RANKING ===
+    # Total GDP contribution over time of every node of the NAICS hierarchy
+    # Identify the top 3 industry sectors (top level of the hierarchy) based on cumulative
+    # economic output; aggregates such as "All industries" do not compete with their sectors
+    top_sectors = Hierarchy.from_frame(df, NAICS).top(top_n, depth=1)
+
+    # Filter the quarterly sector totals to retain only those top 3 sectors
+    df_grouped = df[df['North American Industry Classification System (NAICS)'].isin(top_sectors)].reset_index(drop=True)
+
+    # Keep only the plotted sectors as categories so the legend does not list the others
+    df_grouped['North American Industry Classification System (NAICS)'] = df_grouped['North American Industry Classification System (NAICS)'].cat.remove_unused_categories()
+    return df_grouped
+
+
+def build_chart(gdp_by_sector, top_n=3):
+    """Quarterly GDP of the top 3 industry sectors by cumulative output."""
+    df_grouped = chart_data(gdp_by_sector, top_n)
+
+    # Convert the integer quarter key to timestamps only for plotting
+    df_grouped['REF_DATE'] = quarter_to_timestamp(df_grouped['QUARTER'])
+
+    # === DATA VISUALIZATION ===
+    # Generate a multi-line plot to visualize the GDP trends of the top 3 sectors
+
+    fig = plt.figure(figsize=(14, 6))
+    plot_frame(plt.gca(), df_grouped, x='REF_DATE', y='VALUE',
+               hue='North American Industry Classification System (NAICS)')
+
+    # Academic-style formatting for interpretability
+    plt.title(f'Quarterly GDP of Top {top_n} Industry Sectors in Canada', fontsize=14)
+    plt.xlabel('Quarter')
+    plt.ylabel('GDP (in Millions, Chained 2017 Dollars)')
+    plt.xticks(rotation=45)
+    plt.grid(True)
+    plt.legend(title='Industry Sector')
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    # === DATA INGESTION ===
+    # Load the quarterly GDP dataset from Statistics Canada
+    # The dataset contains GDP values by industry sector, adjusted for inflation (chained 2017 dollars)
+    # Quarterly totals per sector are taken from the memoized pipeline step
+    build_chart(compute('gdp_by_sector'))
+    plt.show()
@@ -0,0 +1,238 @@
+# Benchmark suite for the data pipeline and the chart set
+# Generates StatCan-shaped synthetic data (see synthetic_data.py) at each requested size,
+# times every stage from the raw CSV read to the rendered PNG, writes the timings to JSON
+# and compares them with a stored baseline so that regressions in the loaders or the
+# aggregations are caught before they reach the real extracts.
+#
+# Usage:
+#     python benchmark.py --rows 10000 100000 --save-baseline benchmark_baseline.json
+#     python benchmark.py --rows 10000 100000 --baseline benchmark_baseline.json
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# A stage regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 1.25
+# ...and slower by more than this many seconds (timer noise on tiny inputs)
+DEFAULT_MIN_SECONDS = 0.01
+
+
+def _time(function, repeat):
+    # Best of `repeat` runs; returns (seconds, last result)
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _rows(result):
+    # Output size of a stage: frame/series rows, cube cells or panel vectors
+    if hasattr(result, 'cells'):
+        return len(result.cells)
+    if hasattr(result, 'values') and hasattr(result, 'meta'):
+        return len(result.meta)
+    return len(result) if hasattr(result, '__len__') else None
+
+
+# === STAGES ===
+def run_stages(repeat=3):
+    """Time every stage against the datasets under PESTEL_DATA_DIR -> {stage: {seconds, rows}}.
+
+    Per source: read (plain read_csv), clean, date_parse, parse (schema projection),
+    cache_write/cache_load, then the row-level filter and groupby the charts used to run,
+    the same groupby through parallel_groupby in one process (groupby_encoded) and split
+    over one worker process per core, at least two (groupby_parallel), plus
+    cube_build/panel_build for the price tables. Per chart: build (build_chart(),
+    which filters, aggregates and draws) and render (PNG savefig).
+
+    Must run in a process whose PESTEL_DATA_DIR was set before the project modules were
+    imported, since data_loader resolves its paths at import time.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    import data_loader
+    from parallel_groupby import parallel_agg
+    from price_cube import PriceCube
+    from render_all import CHARTS, _load
+    from vector_panel import VectorPanel
+
+    results = {}
+
+    def record(stage, function):
+        seconds, result = _time(function, repeat)
+        results[stage] = {'seconds': round(seconds, 6), 'rows': _rows(result)}
+        return result
+
+    for name, source in data_loader.SOURCES.items():
+        path = data_loader.DATA_DIR / source['file']
+        date_column = source['date_column']
+        label = data_loader.NAICS if name == 'gdp' else data_loader.NAPCS
+
+        # Legacy path of the chart scripts: full read_csv, header cleanup, date parsing
+        raw = record(f'{name}.read', lambda: pd.read_csv(path, **source['read_kwargs']))
+        cleaned = record(f'{name}.clean', lambda: data_loader.clean_columns(raw))
+        record(f'{name}.date_parse', lambda: data_loader._parse_dates(cleaned[[date_column]].copy(), source))
+
+        # Schema-projected parse and the columnar cache in front of it
+        record(f'{name}.parse', lambda: data_loader.parse_csv(name))
+
+        def cold_load():
+            data_loader.clear_cache(name)
+            return data_loader.load_dataset(name)
+
+        record(f'{name}.cache_write', cold_load)
+        df = record(f'{name}.cache_load', lambda: data_loader.load_dataset(name))
+
+        # Row-level filter and groupby as the charts did before the pre-aggregated structures
+        if name == 'cpi':
+            measures = list(data_loader.SCHEMAS['cpi']['columns'])[1:]
+            recent = record(f'{name}.filter', lambda: df[df['QUARTER'] >= 1997 * 4])
+            record(f'{name}.groupby', lambda: recent.groupby('QUARTER')[measures].mean())
+        else:
+            recent = record(f'{name}.filter', lambda: df[(df['QUARTER'] >= 1997 * 4) & df['VALUE'].notna()])
+            record(f'{name}.groupby', lambda: recent.groupby(['QUARTER', label], observed=True)['VALUE'].mean())
+            # Where these two cross is the MIN_PARALLEL_ROWS / MIN_PARALLEL_WORKERS of this machine
+            workers = max(os.cpu_count() or 1, 2)
+            record(f'{name}.groupby_encoded',
+                   lambda: parallel_agg(recent, ['QUARTER', label], workers=1, min_rows=0))
+            record(f'{name}.groupby_parallel',
+                   lambda: parallel_agg(recent, ['QUARTER', label], workers=workers, min_rows=0, parallel_rows=0))
+
+        if name in ('rmpi', 'ippi'):
+            cube = record(f'{name}.cube_build', lambda: PriceCube.from_frame(df))
+            record(f'{name}.panel_build', lambda: VectorPanel.from_cube(cube))
+
+    # Charts run on the same shared structures render_all.py hands to its workers
+    datasets = {}
+    for chart in CHARTS:
+        module = importlib.import_module(chart)
+        for dataset in module.DATASETS:
+            if dataset not in datasets:
+                datasets[dataset] = _load(dataset)
+        args = [datasets[dataset] for dataset in module.DATASETS]
+
+        # build_chart() and savefig() are timed separately on each run
+        build, render = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fig = module.build_chart(*args)
+            middle = time.perf_counter()
+            fig.savefig(io.BytesIO(), format='png', bbox_inches='tight')
+            build.append(middle - start)
+            render.append(time.perf_counter() - middle)
+            plt.close(fig)
+        results[f'{chart}.build'] = {'seconds': round(min(build), 6), 'rows': None}
+        results[f'{chart}.render'] = {'seconds': round(min(render), 6), 'rows': None}
+    return results
+
+
+def benchmark_size(rows, repeat=3, seed=0, data_dir=None):
+    """Generate `rows`-row synthetic sources and time every stage in a fresh interpreter."""
+    from synthetic_data import generate
+
+    with tempfile.TemporaryDirectory(prefix='pestel-bench-') as tmp:
+        data_dir = Path(data_dir or tmp) / str(rows)
+        generate(data_dir, rows, seed)
+        out = Path(tmp) / 'stages.json'
+        env = {**os.environ, 'PESTEL_DATA_DIR': str(data_dir), 'PESTEL_CACHE_DIR': str(data_dir / '.cache')}
+        subprocess.run([sys.executable, __file__, '--stages-only', str(out), '--repeat', str(repeat)],
+                       env=env, check=True, cwd=Path(__file__).resolve().parent)
+        return json.loads(out.read_text())
+
+
+# === BASELINES ===
+def environment():
+    """Interpreter and library versions recorded next to the timings."""
+    import numpy as np
+    import pandas as pd
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS):
+    """Stages slower than the baseline -> list of (size, stage, baseline s, current s, ratio)."""
+    regressions = []
+    for size, stages in results['sizes'].items():
+        reference = baseline.get('sizes', {}).get(size, {})
+        for stage, timing in stages.items():
+            if stage not in reference:
+                continue
+            before, after = reference[stage]['seconds'], timing['seconds']
+            if after - before > min_seconds and after > before * threshold:
+                regressions.append((size, stage, before, after, after / before if before else float('inf')))
+    return regressions
+
+
+def _report(results):
+    for size, stages in results['sizes'].items():
+        print(f'--- {int(size):,} rows ---')
+        for stage, timing in stages.items():
+            rows = f'{timing["rows"]:>10,}' if timing['rows'] is not None else ' ' * 10
+            print(f'{stage:<22} {timing["seconds"]:9.4f} s {rows}')
+        total = statistics.fsum(t['seconds'] for t in stages.values())
+        print(f'{"total":<22} {total:9.4f} s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PESTEL pipeline on synthetic data.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000],
+                        help='synthetic table sizes to benchmark (e.g. 10000 1000000 10000000)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage (the fastest is kept)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help='keep the generated CSVs here instead of a temporary folder')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with a JSON file written by --save-baseline')
+    parser.add_argument('--save-baseline', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown ratio that counts as a regression')
+    parser.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                        help='ignore slowdowns smaller than this (timer noise)')
+    parser.add_argument('--stages-only', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: time the datasets under PESTEL_DATA_DIR and hand the stages back
+    if args.stages_only:
+        Path(args.stages_only).write_text(json.dumps(run_stages(args.repeat)))
+        return
+
+    results = {'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'sizes': {}}
+    for rows in args.rows:
+        results['sizes'][str(rows)] = benchmark_size(rows, args.repeat, args.seed, args.data_dir)
+    _report(results)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).write_text(json.dumps(results, indent=2) + '\n')
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for size, stage, before, after, ratio in regressions:
+            print(f'REGRESSION {int(size):,} rows {stage}: {before:.4f} s -> {after:.4f} s ({ratio:.2f}x)')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# Online change-point detection over every RMPI/IPPI price series at once
+# A two-sided CUSUM runs on the quarter-over-quarter change of each vector: changes are
+# standardized against the series' own baseline (running mean and variance since its
+# last break) and a break is flagged when the cumulative upward or downward drift
+# passes a threshold, after which the baseline restarts. The state is a handful of
+# numbers per series, so each new quarter costs O(n_series) and history is never
+# rescanned: the detector is stored next to the panel cache and only fed the quarters
+# published since. Quarters where many series break together become shading intervals
+# that any chart can overlay (Grafico10 uses them as crisis windows). The stored state is
+# tied to the source CSV's fingerprint and to a digest of the quarters already processed,
+# so a revision of those quarters triggers a full rescan instead of keeping stale breaks.
+#
+# Usage:
+#     from change_points import update_breaks
+#     detector = update_breaks('rmpi')
+#     detector.intervals()      # [(first quarter, last quarter), ...]
+#     detector.break_dates()    # one row per series break
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, dataset_fingerprint
+from quarters import quarter_to_label
+from vector_panel import load_panel
+
+# Bump whenever the detector's state layout or rules change so stored states are rebuilt
+DETECTOR_VERSION = 1
+
+_STATE = ['levels', 'count', 'mean', 'm2', 'pos', 'neg']
+
+
+class ChangePointDetector:
+    """Two-sided CUSUM over many series, fed one quarter (one value per series) at a time.
+
+    `threshold` and `drift` are in standard deviations of the series' quarterly change,
+    `warmup` is the number of changes needed to estimate a baseline before breaks can be
+    flagged, and `min_scale` (percentage points) floors the baseline's standard deviation
+    so that near-constant series do not break on tiny moves.
+    """
+
+    def __init__(self, threshold=5.0, drift=0.5, warmup=8, min_scale=0.5):
+        self.params = {'threshold': threshold, 'drift': drift, 'warmup': warmup, 'min_scale': min_scale}
+        self.labels = []
+        self._index = {}
+        self.first_quarter = None
+        self.quarter = None
+        self.state = {name: np.empty(0) for name in _STATE}
+        # Break records (series position, quarter, +1 up / -1 down) and per-quarter totals
+        self.breaks = np.empty((0, 3), dtype=np.int64)
+        self.breaks_per_quarter = np.empty(0, dtype=np.int64)
+        self.observed_per_quarter = np.empty(0, dtype=np.int64)
+        # Metadata of the stored state (version, parameters, source fingerprint, ...)
+        self.metadata = {}
+
+    def _add_series(self, labels):
+        new = list(dict.fromkeys(label for label in labels if label not in self._index))
+        if new:
+            self._index.update({label: len(self.labels) + i for i, label in enumerate(new)})
+            self.labels += new
+            for name in _STATE:
+                fill = np.nan if name == 'levels' else 0.0
+                self.state[name] = np.concatenate([self.state[name], np.full(len(new), fill)])
+        return np.array([self._index[label] for label in labels], dtype=np.intp)
+
+    # === UPDATES ===
+    def update(self, quarter, levels, labels=None):
+        """Feed the levels of one quarter; returns the positions of the series that broke.
+
+        `labels` names the series of `levels` (default: the detector's series, in order);
+        unseen labels start with a fresh state. NaN levels leave a series unchanged.
+        """
+        if self.quarter is not None and quarter <= self.quarter:
+            raise ValueError(f'quarter {quarter} already processed (last: {self.quarter})')
+        rows = self._add_series(labels) if labels is not None else np.arange(len(self.labels))
+        s = {name: values[rows] for name, values in self.state.items()}
+        p = self.params
+        levels = np.asarray(levels, dtype=np.float64)
+
+        # Quarterly change in percent against the last observed level
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = (levels / s['levels'] - 1) * 100
+        valid = np.isfinite(change)
+        s['levels'] = np.where(np.isfinite(levels), levels, s['levels'])
+
+        # Standardize against the baseline and accumulate the drift in both directions
+        ready = valid & (s['count'] >= p['warmup'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.maximum(np.sqrt(s['m2'] / (s['count'] - 1)), p['min_scale'])
+            z = np.where(ready, (change - s['mean']) / scale, 0.0)
+        s['pos'] = np.where(ready, np.maximum(0, s['pos'] + z - p['drift']), s['pos'])
+        s['neg'] = np.where(ready, np.maximum(0, s['neg'] - z - p['drift']), s['neg'])
+        broke = ready & ((s['pos'] > p['threshold']) | (s['neg'] > p['threshold']))
+        direction = np.where(s['pos'] > p['threshold'], 1, -1)
+
+        # Welford update of the baseline with this change; a break restarts it
+        count = s['count'] + valid
+        delta = np.where(valid, change - s['mean'], 0.0)
+        s['mean'] = s['mean'] + np.where(valid, delta / np.maximum(count, 1), 0.0)
+        s['m2'] = s['m2'] + np.where(valid, delta * (change - s['mean']), 0.0)
+        s['count'] = count
+        for name in ('count', 'mean', 'm2', 'pos', 'neg'):
+            s[name] = np.where(broke, 0.0, s[name])
+        for name, values in s.items():
+            self.state[name][rows] = values
+
+        broken = rows[broke]
+        self.breaks = np.vstack([self.breaks, np.column_stack([
+            broken, np.full(len(broken), quarter), direction[broke]]).astype(np.int64)])
+        # Per-quarter totals over a contiguous quarter axis (skipped quarters count as zero)
+        if self.first_quarter is None:
+            self.first_quarter = quarter
+        gap = quarter - self.first_quarter - len(self.breaks_per_quarter)
+        self.breaks_per_quarter = np.concatenate([self.breaks_per_quarter, np.zeros(gap, np.int64), [len(broken)]])
+        self.observed_per_quarter = np.concatenate([self.observed_per_quarter, np.zeros(gap, np.int64), [valid.sum()]])
+        self.quarter = quarter
+        return broken
+
+    def extend(self, panel):
+        """Feed every quarter of a VectorPanel after the last processed one; returns how many."""
+        labels = panel.meta['VECTOR'].astype(str).tolist()
+        rows = self._add_series(labels)
+        new = np.flatnonzero(panel.quarters > (self.quarter if self.quarter is not None else -1))
+        for column in new:
+            levels = np.full(len(self.labels), np.nan)
+            levels[rows] = panel.values[:, column]
+            self.update(int(panel.quarters[column]), levels)
+        return len(new)
+
+    # === RESULTS ===
+    def break_dates(self):
+        """One row per detected break: series label, QUARTER, label and direction."""
+        series, quarters, direction = self.breaks.T if len(self.breaks) else ([], [], [])
+        return pd.DataFrame({
+            'series': np.asarray(self.labels, dtype=object)[np.asarray(series, dtype=np.intp)],
+            'QUARTER': np.asarray(quarters, dtype=np.int32),
+            'quarter': quarter_to_label(np.asarray(quarters, dtype=np.int64)),
+            'direction': np.where(np.asarray(direction) > 0, 'up', 'down'),
+        })
+
+    def break_share(self):
+        """(quarters, share of the observed series that broke in each quarter)."""
+        quarters = np.arange(len(self.breaks_per_quarter)) + (self.first_quarter or 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(self.observed_per_quarter > 0, self.breaks_per_quarter / self.observed_per_quarter, 0.0)
+        return quarters, share
+
+    def intervals(self, min_share=0.25, max_gap=1, min_width=6):
+        """(first, last) quarter windows opened by breaks of at least `min_share` of the series.
+
+        A break marks the start of a shock, so each flagged quarter opens a window of at
+        least `min_width` quarters (the shock and its aftermath, up to the last processed
+        quarter); windows separated by at most `max_gap` quiet quarters are merged.
+        """
+        quarters, share = self.break_share()
+        flagged = quarters[share >= min_share]
+        if not len(flagged):
+            return []
+        # Latest quarter covered by any window opened so far
+        covered = np.maximum.accumulate(np.minimum(flagged + max(min_width, 1) - 1, quarters[-1]))
+        # A new window starts wherever a flagged quarter lies too far past the covered ones
+        starts = np.flatnonzero(np.r_[True, flagged[1:] > covered[:-1] + max_gap + 1])
+        ends = np.r_[starts[1:] - 1, len(flagged) - 1]
+        return [(int(flagged[a]), int(covered[b])) for a, b in zip(starts, ends)]
+
+    # === STORAGE ===
+    def save(self, path, metadata=None):
+        meta = {'version': DETECTOR_VERSION, 'params': self.params, 'labels': self.labels,
+                'first_quarter': self.first_quarter, 'quarter': self.quarter, **(metadata or {})}
+        np.savez(path, meta=np.array(json.dumps(meta)), breaks=self.breaks,
+                 breaks_per_quarter=self.breaks_per_quarter, observed_per_quarter=self.observed_per_quarter,
+                 **{f'state_{name}': values for name, values in self.state.items()})
+        self.metadata = meta
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            meta = json.loads(str(stored['meta']))
+            detector = cls(**meta['params'])
+            detector.labels = meta['labels']
+            detector._index = {label: i for i, label in enumerate(detector.labels)}
+            detector.first_quarter, detector.quarter = meta['first_quarter'], meta['quarter']
+            detector.state = {name: stored[f'state_{name}'] for name in _STATE}
+            detector.breaks = stored['breaks']
+            detector.breaks_per_quarter = stored['breaks_per_quarter']
+            detector.observed_per_quarter = stored['observed_per_quarter']
+        detector.metadata = meta
+        return detector
+
+
+def _detector_path(name):
+    return CACHE_DIR / f'{name}.breaks.npz'
+
+
+def _history_digest(panel, quarter):
+    # Hash of the series and of their values up to `quarter`, the input of the stored state
+    digest = hashlib.sha256('\n'.join(panel.meta['VECTOR'].astype(str)).encode())
+    processed = panel.quarters <= (quarter if quarter is not None else -1)
+    digest.update(np.ascontiguousarray(panel.values[:, processed]).tobytes())
+    return digest.hexdigest()
+
+
+def update_breaks(name, rescan=False, **params):
+    """Detector for 'rmpi' or 'ippi', fed only the quarters published since its last run.
+
+    The stored state is reused as is while the source CSV is unchanged. When the CSV
+    changes, only new quarters are fed if the already processed ones are identical;
+    revised values or new series rescan every quarter. The state is also rebuilt when
+    `rescan` is set, when the detector parameters change or when its layout is outdated.
+    """
+    path = _detector_path(name)
+    fingerprint = dataset_fingerprint(name)
+    detector = None
+    if not rescan and path.exists():
+        try:
+            detector = ChangePointDetector.load(path)
+        except (OSError, ValueError, KeyError):
+            detector = None
+        expected = ChangePointDetector(**params).params
+        if detector is not None and (detector.metadata.get('version') != DETECTOR_VERSION
+                                     or detector.params != expected):
+            detector = None
+        if detector is not None and detector.metadata.get('source_sha256') == fingerprint:
+            return detector
+
+    panel = load_panel(name)
+    if detector is not None and detector.metadata.get('history') != _history_digest(panel, detector.quarter):
+        # Quarters that were already processed have been revised
+        detector = None
+    if detector is None:
+        detector = ChangePointDetector(**params)
+    detector.extend(panel)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + '.tmp.npz')
+    detector.save(tmp, {'source_sha256': fingerprint, 'history': _history_digest(panel, detector.quarter)})
+    tmp.replace(path)
+    return detector
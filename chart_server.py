@@ -0,0 +1,404 @@
+# Local HTTP server for the PESTEL charts and their aggregated data
+# The cleaned datasets are loaded once and stay in memory; every chart is an endpoint
+# whose query parameters are the knobs of the scripts (top_n, start_year, keywords,
+# crises). Responses are kept in a size-bounded LRU cache and carry ETags, so repeated
+# requests are answered without rendering and revalidations without a body. Datasets
+# loaded with non-default parameters (e.g. another start_year) go through an LRU cache
+# with the same size bound, so arbitrary query strings cannot grow memory. Only the
+# standard library's asyncio is used; nothing outside this machine is contacted.
+#
+# Endpoints:
+#     GET /                                  charts, formats and parameters (JSON)
+#     GET /charts/<chart>.png|svg?<params>   the rendered chart
+#     GET /data/<chart>.json|arrow?<params>  the aggregated frame the chart plots
+#
+# Usage:
+#     python chart_server.py --port 8050
+#     curl 'http://127.0.0.1:8050/charts/Grafico2.svg?top_n=8'
+#     curl 'http://127.0.0.1:8050/data/Grafico3.json?start_year=2005'
+#     curl 'http://127.0.0.1:8050/charts/Grafico10.png?crises=2008Q3-2010Q4,2020Q1-2021Q4'
+import argparse
+import asyncio
+import hashlib
+import importlib
+import inspect
+import io
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from data_loader import SOURCES, dataset_fingerprint, pa
+from profiling import stage
+from quarters import parse_quarter, quarter_to_label
+from render_all import CHARTS, _load, dataset_parameters
+
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+DATA_FORMATS = {'json': 'application/json', 'arrow': 'application/vnd.apache.arrow.stream'}
+
+_ROUTE = re.compile(r'^/(charts|data)/(\w+)\.(\w+)$')
+
+
+class RequestError(Exception):
+    """A request the server cannot answer; carries the HTTP status to reply with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# === PARAMETERS ===
+def parse_windows(text):
+    """Crisis windows from 'YYYYQn-YYYYQn,...' (empty for none) as (first, last, label) tuples."""
+    windows = []
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        first_label, separator, last_label = item.partition('-')
+        if not separator:
+            raise ValueError(f'expected FIRST-LAST quarters, got {item!r}')
+        first, last = parse_quarter(first_label.strip()), parse_quarter(last_label.strip())
+        if first > last:
+            raise ValueError(f'window {item!r} ends before it starts')
+        windows.append((first, last, f'{first_label.strip()}–{last_label.strip()}'))
+    return tuple(windows)
+
+
+# Parameters whose value is not parsed from the type of their default
+_PARSERS = {'crises': parse_windows}
+
+# Inclusive (low, high) range of numeric parameters (None: unbounded)
+_BOUNDS = {'top_n': (1, None), 'max_lag': (0, None), 'min_width': (1, None), 'min_share': (0, 1),
+           'start_year': (1900, 2100)}
+
+
+def _parse_number(name, text, kind):
+    value = kind(text)
+    low, high = _BOUNDS.get(name, (None, None))
+    if (low is not None and value < low) or (high is not None and value > high):
+        expected = f'>= {low}' if high is None else f'between {low} and {high}'
+        raise ValueError(f'must be {expected}')
+    return value
+
+
+def _parse_value(name, text, default):
+    if name in _PARSERS:
+        return _PARSERS[name](text)
+    if isinstance(default, bool):
+        return text.lower() in ('1', 'true', 'yes')
+    if isinstance(default, int):
+        return _parse_number(name, text, int)
+    if isinstance(default, float):
+        return _parse_number(name, text, float)
+    if isinstance(default, (list, tuple)):
+        return tuple(item.strip() for item in text.split(',') if item.strip())
+    return text
+
+
+def _function_parameters(function, n_datasets):
+    # Keyword parameters of build_chart()/chart_data() after the dataset arguments
+    parameters = list(inspect.signature(function).parameters.values())[n_datasets:]
+    return {p.name: p.default for p in parameters}
+
+
+# === RESPONSES ===
+def _encode_frame(frame, fmt):
+    # Quarter ordinals are opaque outside the project, so a '1997Q1' label goes along
+    if 'QUARTER' in frame.columns:
+        frame = frame.assign(quarter=quarter_to_label(frame['QUARTER']))
+    if fmt == 'json':
+        return frame.to_json(orient='records', date_format='iso', force_ascii=False).encode('utf-8')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class _SizedCache:
+    """LRU mapping bounded by the total size of its values; the newest entry always stays."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key, value, size):
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.bytes += size
+        # Drop the least recently used entries until the cache fits again
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, dropped) = self._entries.popitem(last=False)
+            self.bytes -= dropped
+
+
+class ChartService:
+    """Resident datasets, the response cache and the endpoint logic of the server.
+
+    The datasets with default parameters stay resident (one per dataset name); frames
+    computed with other parameters share `cache_bytes` in a second LRU. Rendering and data preparation run on one worker thread, since pyplot's global
+    figure state is not thread-safe; the event loop keeps answering cache hits and
+    revalidations meanwhile, and concurrent identical requests share one render.
+    """
+
+    def __init__(self, charts=CHARTS, cache_bytes=64 << 20):
+        self.modules = {name: importlib.import_module(name) for name in charts}
+        self.cache_bytes = cache_bytes
+        self._cache = _SizedCache(cache_bytes)
+        self._pending = {}
+        self._datasets = {}
+        self._variants = _SizedCache(cache_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render')
+        # ETags stay valid as long as the source CSVs the datasets were loaded from
+        fingerprints = {}
+        for name in SOURCES:
+            try:
+                fingerprints[name] = dataset_fingerprint(name)
+            except FileNotFoundError:
+                fingerprints[name] = None
+        self.generation = hashlib.sha256(json.dumps(fingerprints, sort_keys=True).encode()).hexdigest()
+
+    # --- parameters ---
+    def parameters(self, name, kind='charts'):
+        """{parameter: default} accepted by an endpoint of chart `name`."""
+        module = self.modules[name]
+        function = module.build_chart if kind == 'charts' else module.chart_data
+        params = {}
+        for dataset in module.DATASETS:
+            params.update(dataset_parameters(dataset))
+        params.update(_function_parameters(function, len(module.DATASETS)))
+        return params
+
+    def parse(self, name, kind, query):
+        """Validated parameter values of a request, by parameter name."""
+        accepted = self.parameters(name, kind)
+        values = {}
+        for key, text in query:
+            if key not in accepted:
+                raise RequestError(400, f'{name}: unknown parameter {key!r}; expected some of {sorted(accepted)}')
+            try:
+                values[key] = _parse_value(key, text, accepted[key])
+            except ValueError as error:
+                raise RequestError(400, f'{name}: invalid {key}={text!r} ({error})') from None
+        return values
+
+    # --- work done on the render thread ---
+    def dataset(self, dataset, params):
+        if not params:
+            if dataset not in self._datasets:
+                with stage(f'{dataset}.load'):
+                    self._datasets[dataset] = _load(dataset)
+            return self._datasets[dataset]
+        key = (dataset, json.dumps(params, sort_keys=True, default=str))
+        frame = self._variants.get(key)
+        if frame is None:
+            with stage(f'{dataset}.load'):
+                # Kept here only: the pipeline's memo and step files would grow per variant
+                frame = _load(dataset, memo=False, **params)
+            self._variants.put(key, frame, int(frame.memory_usage(deep=True).sum()))
+        return frame
+
+    def preload(self):
+        """Load the default datasets of every chart; returns {dataset: error} for the missing ones."""
+        missing = {}
+        for module in self.modules.values():
+            for dataset in module.DATASETS:
+                try:
+                    self.dataset(dataset, {})
+                except FileNotFoundError as error:
+                    missing[dataset] = error
+        return missing
+
+    def produce(self, kind, name, fmt, values):
+        """Bytes of one response body (runs on the render thread)."""
+        module = self.modules[name]
+        datasets = []
+        for dataset in module.DATASETS:
+            own = dataset_parameters(dataset)
+            datasets.append(self.dataset(dataset, {k: v for k, v in values.items() if k in own}))
+        function = module.build_chart if kind == 'charts' else module.chart_data
+        own = _function_parameters(function, len(module.DATASETS))
+        arguments = {k: v for k, v in values.items() if k in own}
+
+        if kind == 'data':
+            return _encode_frame(module.chart_data(*datasets, **arguments), fmt)
+        with stage(f'{name}.build_chart'):
+            fig = module.build_chart(*datasets, **arguments)
+        buffer = io.BytesIO()
+        try:
+            with stage(f'{name}.savefig', format=fmt):
+                fig.savefig(buffer, format=fmt, bbox_inches='tight')
+        finally:
+            plt.close(fig)
+        return buffer.getvalue()
+
+    def index(self):
+        return {
+            'charts': {
+                name: {
+                    'formats': list(CHART_FORMATS),
+                    'parameters': self.parameters(name, 'charts'),
+                    'data_formats': list(DATA_FORMATS),
+                    'data_parameters': self.parameters(name, 'data'),
+                }
+                for name in self.modules
+            },
+            'cache': {'entries': len(self._cache), 'bytes': self._cache.bytes, 'max_bytes': self.cache_bytes},
+            'dataset_cache': {'entries': len(self._variants), 'bytes': self._variants.bytes,
+                              'max_bytes': self.cache_bytes},
+        }
+
+    async def respond(self, method, target, headers):
+        """(status, headers, body) for one request."""
+        if method not in ('GET', 'HEAD'):
+            raise RequestError(405, f'method {method} not allowed')
+        url = urlsplit(target)
+        if url.path == '/':
+            body = json.dumps(self.index(), default=str, indent=2).encode('utf-8')
+            return 200, {'Content-Type': 'application/json'}, body
+
+        match = _ROUTE.match(url.path)
+        if not match:
+            raise RequestError(404, f'no endpoint {url.path}')
+        kind, name, fmt = match.groups()
+        formats = CHART_FORMATS if kind == 'charts' else DATA_FORMATS
+        if name not in self.modules:
+            raise RequestError(404, f'unknown chart {name!r}; expected one of {list(self.modules)}')
+        if fmt not in formats:
+            raise RequestError(404, f'unknown format {fmt!r}; expected one of {list(formats)}')
+        if fmt == 'arrow' and pa is None:
+            raise RequestError(501, 'the Arrow format needs pyarrow')
+        values = self.parse(name, kind, parse_qsl(url.query, keep_blank_values=True))
+
+        # The ETag identifies the content, so a client's copy is revalidated without rendering
+        key = json.dumps([kind, name, fmt, values], sort_keys=True, default=str)
+        etag = '"' + hashlib.sha256((self.generation + key).encode()).hexdigest()[:32] + '"'
+        response_headers = {'Content-Type': formats[fmt], 'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return 304, response_headers, b''
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            return 200, {**response_headers, 'X-Cache': 'hit'}, cached
+
+        # Identical requests arriving during a render wait for the same result
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self.produce, kind, name, fmt, values)
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        try:
+            body = await asyncio.shield(future)
+        except FileNotFoundError as error:
+            raise RequestError(404, f'{name}: missing dataset ({error})') from None
+        except (KeyError, ValueError, TypeError) as error:
+            raise RequestError(400, f'{name}: {type(error).__name__}: {error}') from None
+        if key not in self._cache:
+            self._cache.put(key, body, len(body))
+        return 200, {**response_headers, 'X-Cache': 'miss'}, body
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# === HTTP ===
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 500: 'Internal Server Error', 501: 'Not Implemented'}
+
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode('latin1').strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin1').strip()
+        if not line:
+            break
+        field, _, value = line.partition(':')
+        headers[field.strip().lower()] = value.strip()
+    parts = request_line.split()
+    if len(parts) != 3:
+        raise RequestError(400, f'malformed request line {request_line!r}')
+    return parts[0], parts[1], headers
+
+
+async def handle_connection(service, reader, writer):
+    """Answer one HTTP/1.1 request per connection (Connection: close)."""
+    start = time.perf_counter()
+    method, target = '-', '-'
+    try:
+        method, target, headers = await _read_request(reader)
+        status, response_headers, body = await service.respond(method, target, headers)
+    except RequestError as error:
+        status, response_headers = error.status, {'Content-Type': 'application/json'}
+        body = json.dumps({'error': str(error)}).encode('utf-8')
+    except Exception as error:  # a broken chart must not take the server down
+        status, response_headers = 500, {'Content-Type': 'application/json'}
+        body = json.dumps({'error': f'{type(error).__name__}: {error}'}).encode('utf-8')
+
+    head = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}', f'Content-Length: {len(body)}', 'Connection: close']
+    head += [f'{field}: {value}' for field, value in response_headers.items()]
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin1'))
+    if method != 'HEAD' and status != 304:
+        writer.write(body)
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    print(f'{method} {target} {status} {time.perf_counter() - start:.3f} s', file=sys.stderr)
+
+
+async def serve(host='127.0.0.1', port=8050, charts=CHARTS, cache_mb=64, preload=True):
+    """Run the server until cancelled."""
+    service = ChartService(charts, int(cache_mb * (1 << 20)))
+    loop = asyncio.get_running_loop()
+    if preload:
+        missing = await loop.run_in_executor(service._executor, service.preload)
+        for dataset, error in missing.items():
+            print(f'dataset {dataset} unavailable ({error})', file=sys.stderr)
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f'Serving {len(service.modules)} charts on http://{host}:{port}/', file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the PESTEL charts and their data over local HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--charts', nargs='+', default=CHARTS, choices=CHARTS)
+    parser.add_argument('--cache-mb', type=float, default=64, help='size bound of the response cache and of the cache of non-default datasets')
+    parser.add_argument('--no-preload', action='store_true', help='load datasets on first use instead of at start')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.charts, args.cache_mb, not args.no_preload))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Keyword-based classification of NAPCS/NAICS labels
+# Labels repeat thousands of times in the long-format StatCan tables, so each distinct
+# label is matched once against a single compiled pattern and the result is broadcast
+# back to every row as a categorical column. The bracketed classification code at the
+# end of a label is read by label_code(), shared by vector_panel.py and hierarchy.py.
+import re
+
+import numpy as np
+import pandas as pd
+
+# Keyword groups used by the charts (class name -> keywords, matched case-insensitively)
+FOSSIL_FUELS = {
+    'Fossil Fuels': ['Diesel', 'Gasoline', 'Fuel oils', 'Crude', 'Petroleum'],
+}
+
+# NAPCS/NAICS labels end with their classification code, e.g. 'Diesel fuel [261221]'
+_CODE = re.compile(r'\[([^\]]+)\]\s*$')
+
+
+def label_code(label):
+    """Classification code in brackets at the end of a label, or None."""
+    match = _CODE.search(str(label))
+    return match.group(1) if match else None
+
+
+class KeywordClassifier:
+    """Assign a class to each label based on the keywords it contains.
+
+    `mapping` is an ordered {class: [keywords]} dict; when a label matches keywords
+    from several classes, the class listed first wins. Labels with no match receive
+    `default`, and missing labels stay missing.
+    """
+
+    def __init__(self, mapping, default='Other', case_sensitive=False):
+        self.classes = list(mapping)
+        self.default = default
+        # One named group per class, all alternatives compiled into a single pattern
+        groups = [
+            f'(?P<c{index}>' + '|'.join(re.escape(keyword) for keyword in keywords) + ')'
+            for index, keywords in enumerate(mapping.values())
+            if keywords
+        ]
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self.pattern = re.compile('|'.join(groups), flags) if groups else None
+
+    @property
+    def categories(self):
+        return self.classes + ([self.default] if self.default not in self.classes else [])
+
+    def _classify_label(self, label):
+        if self.pattern is None:
+            return self.categories.index(self.default)
+        # Keep the highest-priority class among all keyword hits in the label
+        best = None
+        for match in self.pattern.finditer(label):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.categories.index(self.default) if best is None else best
+
+    def classify(self, labels):
+        """Return a categorical Series with one class per element of `labels`."""
+        labels = pd.Series(labels)
+        # Factorize so every distinct label is evaluated exactly once
+        codes, uniques = pd.factorize(labels)
+        unique_classes = np.fromiter(
+            (self._classify_label(str(label)) for label in uniques), dtype=np.int32, count=len(uniques)
+        )
+        class_codes = np.where(codes >= 0, unique_classes[codes] if len(uniques) else -1, -1)
+        return pd.Series(
+            pd.Categorical.from_codes(class_codes, categories=self.categories),
+            index=labels.index,
+            name=labels.name,
+        )
+
+
+def classify_labels(labels, mapping, default='Other', case_sensitive=False):
+    """Shortcut for KeywordClassifier(mapping, default, case_sensitive).classify(labels)."""
+    return KeywordClassifier(mapping, default, case_sensitive).classify(labels)
@@ -0,0 +1,264 @@
+# Shared loader for the Statistics Canada and Bank of Canada datasets
+# Every chart script reads its table through load_dataset(), which parses each CSV once
+# into a typed columnar cache (Arrow IPC) and memory-maps it on subsequent runs, so a
+# caller that asks for a few columns only reads and converts those columns.
+# Column projection, dtypes and layout checks come from the declarative schemas in schemas.py.
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from profiling import stage
+from quarters import quarter_ordinal
+from schemas import NAICS, NAPCS, SCHEMAS, SchemaError, check_header, check_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the cache is simply skipped without pyarrow
+    pa = None
+    feather = None
+
+# === CONFIGURATION ===
+# Datasets are expected next to the scripts unless PESTEL_DATA_DIR points elsewhere
+DATA_DIR = Path(os.environ.get('PESTEL_DATA_DIR', Path(__file__).resolve().parent))
+CACHE_DIR = Path(os.environ.get('PESTEL_CACHE_DIR', DATA_DIR / '.cache'))
+
+# Bump whenever the cleaning rules below change so stale caches are rebuilt
+CACHE_VERSION = 3
+
+# One entry per source: file name, read_csv options and the date column to parse
+# Every table gains an int 'QUARTER' column (see quarters.py) used as the time key
+SOURCES = {
+    'rmpi': {
+        'file': '18100268-RAW_QuarterNormal.csv',
+        'read_kwargs': {'encoding': 'latin1', 'low_memory': False},
+        'date_column': 'REF_DATE',
+        'quarterly': True,
+    },
+    'ippi': {
+        'file': '18100272-IPRI1203.csv',
+        'read_kwargs': {'encoding': 'latin1', 'low_memory': False},
+        'date_column': 'REF_DATE',
+        'quarterly': True,
+    },
+    'gdp': {
+        'file': '36100434.csv',
+        'read_kwargs': {'encoding': 'latin1', 'low_memory': False},
+        'date_column': 'REF_DATE',
+        'quarterly': True,
+    },
+    'cpi': {
+        'file': 'CPI_MONTHLY.csv',
+        'read_kwargs': {},
+        'date_column': 'date',
+        'quarterly': False,
+    },
+}
+
+# Byte order marks as they appear in headers when decoded as UTF-8 or latin1
+_BOM_MARKERS = ('\ufeff', 'ï»¿')
+
+
+# === CLEANING ===
+def _strip_bom(name):
+    for marker in _BOM_MARKERS:
+        name = name.replace(marker, '')
+    return name
+
+
+def clean_header(columns):
+    """Map raw CSV headers to cleaned names, leaving out headers that should be dropped.
+
+    Whitespace and BOM artifacts are stripped. When removing the BOM would duplicate an
+    existing header (the RMPI file ships two REF_DATE columns), the BOM-prefixed column
+    is dropped and the original quarterly label column is kept, matching what the chart
+    scripts always used.
+    """
+    stripped = [str(c).strip() for c in columns]
+    mapping = {}
+    for original, name in zip(columns, stripped):
+        clean = _strip_bom(name)
+        if clean == name or clean not in stripped:
+            mapping[original] = clean
+    return mapping
+
+
+def clean_columns(df):
+    """Strip header whitespace and BOM artifacts (see clean_header)."""
+    mapping = clean_header(df.columns)
+    return df[list(mapping)].rename(columns=mapping)
+
+
+def _parse_dates(df, source):
+    # StatCan REF_DATE labels ('1997Q1' or '1997-01-01') are parsed once per distinct label
+    # into quarter ordinals; monthly sources keep a datetime column alongside the ordinal
+    column = source['date_column']
+    if not source['quarterly']:
+        df[column] = pd.to_datetime(df[column])
+    df['QUARTER'] = quarter_ordinal(df[column])
+    return df
+
+
+def schema_read_options(name, path, columns=None):
+    """Check a source file's header against its schema and return the read_csv projection.
+
+    Returns ({'usecols': ..., 'dtype': ...}, rename) where `rename` maps the raw headers
+    to cleaned names. `columns` narrows the projection to the listed cleaned names
+    (columns outside the schema are read with inferred dtypes).
+    """
+    schema = SCHEMAS[name]
+    header = pd.read_csv(path, nrows=0, **SOURCES[name]['read_kwargs']).columns
+    check_header(name, [_strip_bom(str(c).strip()) for c in header])
+    wanted = schema['columns'] if columns is None else {c: schema['columns'].get(c) for c in columns}
+    rename = {raw: clean for raw, clean in clean_header(header).items() if clean in wanted}
+    unknown = [c for c in wanted if c not in rename.values()]
+    if unknown:
+        raise SchemaError(f'{name}: unknown columns {unknown}')
+    dtype = {raw: wanted[clean] for raw, clean in rename.items() if wanted[clean]}
+    return {'usecols': list(rename), 'dtype': dtype}, rename
+
+
+def parse_csv(name, path=None):
+    """Read a source CSV with its schema projection and dtypes, then validate it (no caching)."""
+    source = SOURCES[name]
+    path = DATA_DIR / source['file'] if path is None else path
+    options, rename = schema_read_options(name, path)
+    with stage(f'{name}.read_csv') as measured:
+        df = pd.read_csv(path, **source['read_kwargs'], **options).rename(columns=rename)
+        measured.rows_out = len(df)
+    with stage(f'{name}.check_rows', rows_in=len(df)):
+        check_rows(name, df)
+    with stage(f'{name}.parse_dates', rows_in=len(df)) as measured:
+        df = _parse_dates(df, source)
+        measured.rows_out = len(df)
+    return df
+
+
+# === CACHE ===
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(name):
+    return CACHE_DIR / f'{name}.arrow', CACHE_DIR / f'{name}.json'
+
+
+def _read_meta(meta_path):
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def save_frame(df, path, metadata=None):
+    """Atomically write a frame as an uncompressed Arrow IPC file (memory-mappable).
+
+    `metadata` is an optional dict of strings stored in the file's schema.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    _write_atomic(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+
+
+def read_frame(path, columns=None):
+    """Return an Arrow IPC file written by save_frame() as a DataFrame.
+
+    The file is memory-mapped and only `columns` (default: all) are converted, so the
+    columns that are not asked for are never read from disk.
+    """
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    # Arrow keeps the file's column order; the frame follows the order asked for
+    return (table if columns is None else table.select(columns)).to_pandas()
+
+
+def frame_metadata(path):
+    """Return the string metadata stored by save_frame(), or None if the file is unreadable."""
+    try:
+        schema = pa.ipc.open_file(pa.memory_map(str(path))).schema
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return {k.decode(): v.decode() for k, v in (schema.metadata or {}).items()}
+
+
+def dataset_fingerprint(name):
+    """SHA-256 of a source CSV, reusing the cache metadata when size and mtime still match."""
+    path = DATA_DIR / SOURCES[name]['file']
+    stat = path.stat()
+    meta = _read_meta(_cache_paths(name)[1])
+    if meta and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        return meta['sha256']
+    return _file_hash(path)
+
+
+def _cache_is_valid(meta, stat, path):
+    """Cheap size/mtime check first; fall back to the content hash when only the mtime moved."""
+    if not meta or meta.get('version') != CACHE_VERSION or meta.get('size') != stat.st_size:
+        return False, None
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True, None
+    digest = _file_hash(path)
+    return digest == meta.get('sha256'), digest
+
+
+def load_dataset(name, use_cache=True, columns=None):
+    """Return the cleaned table for one of SOURCES ('rmpi', 'ippi', 'gdp', 'cpi').
+
+    `columns` limits the result to the listed cleaned columns (default: all). The cache
+    is keyed on the CSV's size, mtime and SHA-256; a touched but unchanged file only
+    refreshes the metadata, while any content change triggers a re-parse.
+    """
+    source = SOURCES[name]
+    path = DATA_DIR / source['file']
+    if not use_cache or feather is None:
+        df = parse_csv(name, path)
+        return df if columns is None else df[columns]
+
+    stat = path.stat()
+    cache_path, meta_path = _cache_paths(name)
+    meta = _read_meta(meta_path)
+    valid, digest = _cache_is_valid(meta, stat, path) if cache_path.exists() else (False, None)
+
+    if valid:
+        if digest is not None:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_atomic(meta_path, lambda tmp: tmp.write_text(json.dumps(meta)))
+        with stage(f'{name}.cache_load') as measured:
+            df = read_frame(cache_path, columns)
+            measured.rows_out = len(df)
+        return df
+
+    df = parse_csv(name, path)
+    with stage(f'{name}.cache_write', rows_in=len(df)):
+        save_frame(df, cache_path)
+    meta = {
+        'version': CACHE_VERSION,
+        'source': source['file'],
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest or _file_hash(path),
+    }
+    _write_atomic(meta_path, lambda tmp: tmp.write_text(json.dumps(meta)))
+    return df if columns is None else df[columns]
+
+
+def clear_cache(name=None):
+    """Remove the cached table for one source, or for all of them."""
+    for key in ([name] if name else SOURCES):
+        for cache_file in _cache_paths(key):
+            cache_file.unlink(missing_ok=True)
@@ -0,0 +1,162 @@
+# Small-multiples rendering of the RMPI/IPPI series, one panel per region or product
+# The vector panel is reduced once to a (facet, series, quarter) array of pooled means
+# (VectorPanel.facet_mean), and every panel of the grid draws its rows with a single
+# LineCollection on shared x and y axes. Grids larger than one page are split into tiles
+# rendered by separate worker processes with the same axis limits, so the tiles stay
+# comparable side by side.
+#
+# Usage:
+#     python facets.py rmpi --facet GEO --top-n 5 --output-dir charts
+#     python facets.py ippi --facet NAPCS --top-n 24 --per-tile 12 --jobs 4
+import argparse
+import math
+import os
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.lines import Line2D
+
+from data_loader import NAPCS
+from line_plot import plot_lines
+from profiling import stage
+from vector_panel import load_panel
+from volatility import top_volatile
+
+# Short names for the facet dimensions on the command line
+FACETS = {'GEO': 'GEO', 'NAPCS': NAPCS}
+
+
+def facet_data(panel, facet='GEO', top_n=5, metric='row_range'):
+    """(facet labels, series labels, (n_facets, n_series, n_quarters)) for a small-multiples grid.
+
+    Faceting by region draws the `top_n` most volatile products in every panel; faceting
+    by product gives one panel per top product with one line per region.
+    """
+    top_products = top_volatile(panel, k=top_n, metric=metric)
+    if facet == NAPCS:
+        return panel.facet_mean(NAPCS, by='GEO', facets=top_products)
+    return panel.facet_mean(facet, by=NAPCS, groups=top_products)
+
+
+def value_limits(array, margin=0.05):
+    """Common y limits of every panel (NaN-safe), with a small margin."""
+    finite = np.asarray(array)[np.isfinite(array)]
+    if not len(finite):
+        return None
+    low, high = float(finite.min()), float(finite.max())
+    pad = (high - low) * margin or 1.0
+    return low - pad, high + pad
+
+
+def facet_figure(x, array, facet_labels, labels, ncols=4, ylim=None, title=None,
+                 legend_title=None, max_points=None):
+    """One figure with a panel per facet; every row of array[i] is a line of panel i.
+
+    Panels share both axes. Each series keeps the same color in every panel and is
+    listed once in a legend below the grid.
+    """
+    ncols = max(1, min(ncols, len(facet_labels)))
+    nrows = max(1, math.ceil(len(facet_labels) / ncols))
+    # The grid geometry is known, so the margins are set in inches instead of running
+    # tight_layout, which measures every tick label of every panel; the bottom leaves
+    # room for the date labels and the legend (title plus one line per row of entries)
+    bottom = 0.45 + 0.22 * (math.ceil(len(labels) / 3) + 1)
+    top = 0.75 if title else 0.4
+    width, height = 3.6 * ncols, 2.3 * nrows + bottom + top
+    fig, axes = plt.subplots(nrows, ncols, figsize=(width, height), sharex=True, sharey=True, squeeze=False)
+    fig.subplots_adjust(left=0.5 / width, right=1 - 0.15 / width, bottom=bottom / height,
+                        top=1 - top / height, wspace=0.12, hspace=0.3)
+    cycle = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+    colors = [cycle[i % len(cycle)] for i in range(len(labels))]
+
+    for ax, facet_label, matrix in zip(axes.flat, facet_labels, array):
+        plot_lines(ax, x, matrix, max_points=max_points, colors=colors, linewidth=1)
+        ax.set_title(textwrap.shorten(str(facet_label), 45, placeholder='…'), fontsize=9)
+        ax.grid(True, linewidth=0.5)
+        ax.tick_params(labelsize=7)
+    # Hide the unused slots of the last row; the panels above them show the date labels
+    for position in range(len(facet_labels), nrows * ncols):
+        axes.flat[position].set_visible(False)
+        axes.flat[position - ncols].tick_params(labelbottom=True)
+    if ylim is not None:
+        axes[0, 0].set_ylim(ylim)
+
+    handles = [Line2D([], [], color=color, label=str(label)) for label, color in zip(labels, colors)]
+    fig.legend(handles=handles, title=legend_title, loc='lower center', ncol=min(len(handles), 3), fontsize=8)
+    if title:
+        fig.suptitle(title, fontsize=13)
+    return fig
+
+
+def _render_tile(path, formats, x, array, facet_labels, labels, ncols, ylim, title, legend_title):
+    # Runs in a worker process: draw one tile of the grid and save it
+    matplotlib.use('Agg')
+    with stage('facets.tile', rows_in=len(facet_labels)):
+        fig = facet_figure(x, array, facet_labels, labels, ncols, ylim, title, legend_title)
+        paths = []
+        for fmt in formats:
+            fig.savefig(f'{path}.{fmt}', format=fmt)
+            paths.append(f'{path}.{fmt}')
+        plt.close(fig)
+    return paths
+
+
+def render_tiles(x, array, facet_labels, labels, output_prefix, per_tile=16, ncols=4,
+                 formats=('png',), jobs=None, title=None, legend_title=None):
+    """Save the grid as tiles of at most `per_tile` panels and return the file paths.
+
+    Tiles are rendered in parallel worker processes; a single tile, or jobs=1, is
+    rendered in this process. Every tile uses the y limits of the whole grid.
+    """
+    ylim = value_limits(array)
+    starts = range(0, len(facet_labels), per_tile)
+    tiles = []
+    for number, start in enumerate(starts, 1):
+        suffix = f'-{number}' if len(starts) > 1 else ''
+        tile_title = f'{title} ({number}/{len(starts)})' if title and len(starts) > 1 else title
+        tiles.append((f'{output_prefix}{suffix}', formats, x, array[start:start + per_tile],
+                      facet_labels[start:start + per_tile], labels, ncols, ylim, tile_title, legend_title))
+
+    if len(tiles) == 1 or jobs == 1:
+        return [path for tile in tiles for path in _render_tile(*tile)]
+    with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(tiles))) as pool:
+        return [path for paths in pool.map(_render_tile, *zip(*tiles)) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render RMPI/IPPI small multiples, one panel per region or product.')
+    parser.add_argument('source', choices=['rmpi', 'ippi'])
+    parser.add_argument('--facet', default='GEO', choices=list(FACETS), help='one panel per region or per product')
+    parser.add_argument('--top-n', type=int, default=5, help='number of most volatile products to draw')
+    parser.add_argument('--per-tile', type=int, default=16, help='panels per output file')
+    parser.add_argument('--ncols', type=int, default=4)
+    parser.add_argument('--output-dir', default='charts')
+    parser.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    args = parser.parse_args()
+    matplotlib.use('Agg')
+
+    start = time.perf_counter()
+    panel = load_panel(args.source)
+    facet = FACETS[args.facet]
+    facet_labels, labels, array = facet_data(panel, facet, args.top_n)
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    paths = render_tiles(
+        panel.timestamps(), array, facet_labels, labels,
+        Path(args.output_dir) / f'{args.source}-by-{args.facet.lower()}',
+        args.per_tile, args.ncols, args.formats, args.jobs,
+        title=f'{args.source.upper()} price index by {"region" if facet == "GEO" else "product"}',
+        legend_title='Region' if facet == NAPCS else 'Product',
+    )
+    for path in paths:
+        print(path)
+    print(f'{len(facet_labels)} panels in {time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
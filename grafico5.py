@@ -1,72 +1,67 @@
 # Import data manipulation and visualization libraries
-import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 
-# === DATA INGESTION ===
-# Load the GDP dataset from Statistics Canada
-# This dataset contains quarterly estimates of gross domestic product (GDP) broken down by industrial sector
-df = pd.read_csv(
-    r"C:\Users\FabiodosSantosPrumuc\Desktop\meusdatasets\36100434.csv",
-    encoding='latin1',
-    low_memory=False
-)
+from data_loader import NAICS
+from hierarchy import Hierarchy
+from line_plot import plot_frame
+from pipeline import compute
+from quarters import quarter_to_timestamp
 
-# Handle improperly encoded column name if present (common in CSVs from government sources)
-if 'ï»¿REF_DATE' in df.columns:
-    df.rename(columns={'ï»¿REF_DATE': 'REF_DATE'}, inplace=True)
+# Datasets required by this chart (render_all.py loads each one once and shares it)
+DATASETS = ['gdp_by_sector']
 
-# Clean column names by stripping trailing spaces
-df.columns = df.columns.str.strip()
 
-# Convert 'REF_DATE' from quarterly label to datetime format for time series analysis
-df['REF_DATE'] = pd.PeriodIndex(df['REF_DATE'], freq='Q').to_timestamp()
+def chart_data(gdp_by_sector, top_n=5):
+    """Quarterly GDP of the `top_n` industrial sectors, excluding high-level aggregates."""
+    # GDP summed per quarter and sector, rows with missing values already removed
+    # (memoized 'gdp_by_sector' step, shared with Grafico7)
+    df = gdp_by_sector
 
-# Remove rows with missing GDP values to ensure integrity of the analysis
-df = df.dropna(subset=['VALUE'])
+    # === SECTOR SELECTION ===
+    # Rank only the most detailed industries of the NAICS hierarchy: high-level aggregates
+    # (e.g., "All industries") and sectors that contain other published industries are left
+    # out, so no GDP is counted twice
+    top_5 = Hierarchy.from_frame(df, NAICS).top_leaves(top_n)
 
-# === SECTOR SELECTION ===
-# Exclude high-level aggregates (e.g., "All industries") to focus only on actual industrial sectors
-excluded = [
-    'All industries',
-    'Goods-producing industries',
-    'Service-producing industries',
-    'Business sector industries'
-]
-df_industrial = df[~df['North American Industry Classification System (NAICS)'].isin(excluded)]
+    # Keep the quarterly GDP of the top 5 sectors only
+    df_grouped = df[
+        df['North American Industry Classification System (NAICS)'].isin(top_5)
+    ].reset_index(drop=True)
 
-# Identify the top 5 industrial sectors with the highest cumulative GDP
-top_5 = df_industrial.groupby(
-    'North American Industry Classification System (NAICS)'
-)['VALUE'].sum().nlargest(5).index.tolist()
+    # Keep only the plotted sectors as categories so the legend does not list the others
+    df_grouped['North American Industry Classification System (NAICS)'] = df_grouped['North American Industry Classification System (NAICS)'].cat.remove_unused_categories()
+    return df_grouped
 
-# Filter dataset to include only the top 5 sectors
-df_top5 = df_industrial[
-    df_industrial['North American Industry Classification System (NAICS)'].isin(top_5)
-]
 
-# Group data by quarter and sector, summing GDP values for each combination
-df_grouped = df_top5.groupby(
-    ['REF_DATE', 'North American Industry Classification System (NAICS)']
-)['VALUE'].sum().reset_index()
+def build_chart(gdp_by_sector, top_n=5):
+    """Quarterly GDP of the top 5 industrial sectors, excluding high-level aggregates."""
+    df_grouped = chart_data(gdp_by_sector, top_n)
 
-# === DATA VISUALIZATION ===
-# Create a multi-line time series plot showing the quarterly GDP performance of the top 5 sectors
+    # Convert the integer quarter key to timestamps only for plotting
+    df_grouped['REF_DATE'] = quarter_to_timestamp(df_grouped['QUARTER'])
 
-plt.figure(figsize=(14, 6))
-sns.lineplot(
-    data=df_grouped,
-    x='REF_DATE',
-    y='VALUE',
-    hue='North American Industry Classification System (NAICS)'
-)
+    # === DATA VISUALIZATION ===
+    # Create a multi-line time series plot showing the quarterly GDP performance of the top 5 sectors
 
-# Add academic-quality formatting to the chart
-plt.title('Quarterly GDP of Top 5 Industrial Sectors in Canada', fontsize=14)
-plt.xlabel('Quarter')
-plt.ylabel('GDP (in Millions, Chained 2017 Dollars)')
-plt.xticks(rotation=45)
-plt.grid(True)
-plt.legend(title='Industrial Sector')
-plt.tight_layout()
-plt.show()
+    fig = plt.figure(figsize=(14, 6))
+    plot_frame(plt.gca(), df_grouped, x='REF_DATE', y='VALUE',
+               hue='North American Industry Classification System (NAICS)')
+
+    # Add academic-quality formatting to the chart
+    plt.title(f'Quarterly GDP of Top {top_n} Industrial Sectors in Canada', fontsize=14)
+    plt.xlabel('Quarter')
+    plt.ylabel('GDP (in Millions, Chained 2017 Dollars)')
+    plt.xticks(rotation=45)
+    plt.grid(True)
+    plt.legend(title='Industrial Sector')
+    plt.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    # === DATA INGESTION ===
+    # Load the GDP dataset from Statistics Canada
+    # This dataset contains quarterly estimates of gross domestic product (GDP) broken down by industrial sector
+    # Its per-sector quarterly totals come from the memoized pipeline step
+    build_chart(compute('gdp_by_sector'))
+    plt.show()
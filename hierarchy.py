@@ -0,0 +1,199 @@
+# Classification tree of the NAICS/NAPCS labels with precomputed roll-ups
+# StatCan labels end with their classification code in brackets ("Oil and gas extraction
+# [211]", "Manufacturing [31-33]", "All industries [T001]"). Numeric codes nest by prefix,
+# so each label's parent is the longest published code its own code starts with (or the
+# range it falls in). Codes that are not numeric (T001 All industries, T002 Goods-producing
+# industries, ...) are published aggregates outside the tree. Values are rolled up once,
+# bottom-up, one tree level at a time: a node keeps its own published value and only falls
+# back to the sum of its children where it has none, so a parent and its children are never
+# added together. Rankings of the leaves and of every depth are sorted once as well, so the
+# charts ask for "top N sectors" without string scans or exclusion lists.
+#
+# Usage:
+#     from hierarchy import Hierarchy
+#     tree = Hierarchy.from_frame(compute('gdp_by_sector'), NAICS)
+#     tree.top(3, depth=1)      # three largest sectors
+#     tree.top_leaves(5)        # five largest most-detailed industries
+#     tree.total()              # quarterly total of all industries
+import re
+
+import numpy as np
+
+from classify import label_code
+
+# Codes StatCan uses for the total of a classification
+TOTAL_CODES = ('T001',)
+
+_NUMERIC = re.compile(r'^(\d+)(?:-(\d+))?$')
+
+
+def _code_range(code):
+    # (first, last) prefixes a numeric code covers ('31-33' -> ('31', '33')), or None
+    match = _NUMERIC.match(code or '')
+    if not match:
+        return None
+    first, last = match.group(1), match.group(2) or match.group(1)
+    return (first, last) if len(first) == len(last) else None
+
+
+class Hierarchy:
+    """Parent/child tree of classification labels, with optional values per (label, quarter).
+
+    `parents[i]` is the position of label i's parent (-1 for roots and aggregates) and
+    `depths[i]` its depth (1 for the roots of the tree, 0 for aggregates without a numeric
+    code). With values, `rollup` holds every node's quarterly value and `totals` its sum
+    over all quarters, which orders the top() queries.
+    """
+
+    def __init__(self, labels, values=None, quarters=None):
+        self.labels = [str(label) for label in labels]
+        self.codes = [label_code(label) for label in self.labels]
+        self._index = {}
+        for i, (label, code) in enumerate(zip(self.labels, self.codes)):
+            # A node is found by its full label, its code or its label without the code
+            for key in (label, code, label.rsplit(' [', 1)[0] if code else None):
+                if key is not None:
+                    self._index.setdefault(key, i)
+        self._link()
+        self.quarters = None if quarters is None else np.asarray(quarters)
+        self.rollup = None
+        if values is not None:
+            self._roll_up(np.asarray(values, dtype=np.float64))
+
+    @classmethod
+    def from_frame(cls, df, column, value='VALUE', key='QUARTER'):
+        """Tree of the labels of `column` in a long frame, with its values summed per quarter."""
+        labels = df[column].astype('category')
+        quarters = df[key].to_numpy(dtype=np.int64)
+        first = int(quarters.min()) if len(quarters) else 0
+        span = int(quarters.max()) - first + 1 if len(quarters) else 0
+        rows, columns = labels.cat.codes.to_numpy(), quarters - first
+        values = df[value].to_numpy(dtype=np.float64, na_value=np.nan)
+        observed = np.isfinite(values)
+        # Dense (label, quarter) sums; cells without any value stay NaN
+        matrix = np.zeros((len(labels.cat.categories), span))
+        counts = np.zeros_like(matrix)
+        np.add.at(matrix, (rows[observed], columns[observed]), values[observed])
+        np.add.at(counts, (rows[observed], columns[observed]), 1)
+        matrix[counts == 0] = np.nan
+        return cls(labels.cat.categories, matrix, np.arange(first, first + span))
+
+    # === TREE ===
+    def _link(self):
+        ranges = [_code_range(code) for code in self.codes]
+        # Published codes by prefix; a range is reachable from every prefix it spans
+        plain, spans = {}, {}
+        for i, covered in enumerate(ranges):
+            if covered is None:
+                continue
+            first, last = covered
+            if first == last:
+                plain.setdefault(first, i)
+            else:
+                for prefix in range(int(first), int(last) + 1):
+                    spans.setdefault(str(prefix).zfill(len(first)), i)
+
+        self.parents = np.full(len(self.labels), -1, dtype=np.intp)
+        for i, covered in enumerate(ranges):
+            if covered is None:
+                continue
+            code = covered[0]
+            # Walk up the prefixes of the code; a plain code is more specific than a range
+            for k in range(len(code), 0, -1):
+                prefix = code[:k]
+                if k < len(code) and prefix in plain:
+                    self.parents[i] = plain[prefix]
+                    break
+                if spans.get(prefix, i) != i:
+                    self.parents[i] = spans[prefix]
+                    break
+
+        self.depths = np.zeros(len(self.labels), dtype=np.intp)
+        in_tree = np.array([covered is not None for covered in ranges], dtype=bool)
+        self.depths[in_tree] = 1
+        # Depths follow the parent links; a tree of depth d settles in d passes
+        for _ in range(len(self.labels)):
+            linked = self.parents >= 0
+            depths = self.depths.copy()
+            depths[linked] = self.depths[self.parents[linked]] + 1
+            if (depths == self.depths).all():
+                break
+            self.depths = depths
+        self.is_leaf = in_tree.copy()
+        self.is_leaf[self.parents[self.parents >= 0]] = False
+        self.is_aggregate = ~in_tree
+
+    def node(self, label):
+        """Position of a node given its full label, its code or its label without the code."""
+        try:
+            return self._index[str(label)]
+        except KeyError:
+            raise KeyError(f'unknown classification label or code {label!r}') from None
+
+    def parent(self, label):
+        """Label of the parent of `label`, or None for roots and aggregates."""
+        position = self.parents[self.node(label)]
+        return self.labels[position] if position >= 0 else None
+
+    def children(self, label):
+        """Labels of the direct children of `label`."""
+        return [self.labels[i] for i in np.flatnonzero(self.parents == self.node(label))]
+
+    def leaves(self):
+        """Labels of the most detailed published nodes (no published children)."""
+        return [self.labels[i] for i in np.flatnonzero(self.is_leaf)]
+
+    # === ROLL-UPS ===
+    def _roll_up(self, values):
+        if values.shape[0] != len(self.labels):
+            raise ValueError(f'values have {values.shape[0]} rows for {len(self.labels)} labels')
+        rollup = values.copy()
+        # Deepest level first, so every child is final before it is added to its parent
+        for depth in range(int(self.depths.max(initial=0)), 1, -1):
+            children = np.flatnonzero(self.depths == depth)
+            parents = self.parents[children]
+            sums = np.zeros((len(self.labels), rollup.shape[1]))
+            observed = np.zeros(sums.shape, dtype=bool)
+            np.add.at(sums, parents, np.nan_to_num(rollup[children]))
+            np.logical_or.at(observed, parents, np.isfinite(rollup[children]))
+            targets = np.unique(parents)
+            own = rollup[targets]
+            rollup[targets] = np.where(np.isfinite(own), own, np.where(observed[targets], sums[targets], np.nan))
+        self.rollup = rollup
+        self.totals = np.nansum(rollup, axis=1)
+
+        # Nodes from largest to smallest total, then the same order within each query
+        order = np.argsort(-self.totals, kind='stable')
+        self._leaf_order = order[self.is_leaf[order]]
+        self._depth_order = {int(d): order[self.depths[order] == d] for d in np.unique(self.depths)}
+        # The published total (treated as the parent of the roots), else the roots' sum
+        roots = np.flatnonzero(self.depths == 1)
+        self._total = np.where(np.isfinite(rollup[roots]).any(axis=0), np.nansum(rollup[roots], axis=0), np.nan)
+        published = [i for i, code in enumerate(self.codes) if code in TOTAL_CODES]
+        if published:
+            own = rollup[published[0]]
+            self._total = np.where(np.isfinite(own), own, self._total)
+
+    def _values(self):
+        if self.rollup is None:
+            raise ValueError('this hierarchy has no values; build it with Hierarchy.from_frame()')
+        return self.rollup
+
+    def top(self, n, depth=1):
+        """Labels of the `n` nodes at `depth` with the largest total (depth 0: aggregates)."""
+        self._values()
+        return [self.labels[i] for i in self._depth_order.get(depth, [])[:n]]
+
+    def top_leaves(self, n):
+        """Labels of the `n` most detailed nodes with the largest total."""
+        self._values()
+        return [self.labels[i] for i in self._leaf_order[:n]]
+
+    def series(self, label):
+        """Quarterly rolled-up values of one node."""
+        return self._values()[self.node(label)]
+
+    def total(self):
+        """Quarterly total of the classification (e.g. All industries [T001])."""
+        self._values()
+        return self._total
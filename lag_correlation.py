@@ -0,0 +1,179 @@
+# Lagged cross-correlation between the RMPI/IPPI price series and the CPI measures
+# For every price series x, CPI measure y and lag k in [-max_lag, max_lag], the Pearson
+# correlation of x(t) with y(t + k) is computed over the quarters where both are observed
+# (a positive lag means prices lead inflation). All series, measures and lags are done at
+# once: the CPI matrix is stacked with one shifted copy per lag and the pairwise sums of
+# the correlation (n, sum x, sum y, sum x^2, sum y^2, sum xy) come out of six matrix
+# products with NaN gaps masked to zero, instead of a Python loop over pairs.
+#
+# Usage:
+#     from lag_correlation import correlate_panel
+#     result = correlate_panel(load_panel('rmpi'), compute('cpi_quarterly'), max_lag=8)
+#     result.best()
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from pipeline import CPI_MEASURES
+from volatility import top_k
+
+TRANSFORMS = ['level', 'diff', 'pct_change', 'yoy']
+
+# Rows of the price matrix handled per block, which bounds the memory of the products
+_BLOCK_ROWS = 4096
+
+
+def transform(matrix, how='yoy'):
+    """Price levels turned into the series that is correlated, keeping the shape.
+
+    'yoy' is the change over four quarters in percent (the CPI measures are year-over-year
+    rates), 'pct_change' the quarter-over-quarter change in percent, 'diff' the quarterly
+    difference and 'level' the index itself. Leading quarters without a base are NaN.
+    """
+    if how not in TRANSFORMS:
+        raise ValueError(f'unknown transform {how!r}; expected one of {TRANSFORMS}')
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if how == 'level':
+        return matrix
+    periods = 4 if how == 'yoy' else 1
+    result = np.full_like(matrix, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if how == 'diff':
+            result[:, periods:] = matrix[:, periods:] - matrix[:, :-periods]
+        else:
+            result[:, periods:] = (matrix[:, periods:] / matrix[:, :-periods] - 1) * 100
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def _centered(matrix):
+    # Subtracting each row's mean leaves correlations unchanged but keeps the sums of
+    # squares well conditioned; gaps become zeros so they drop out of the products
+    observed = ~np.isnan(matrix)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        means = np.nanmean(matrix, axis=1, keepdims=True)
+    return np.where(observed, matrix - np.nan_to_num(means), 0.0), observed.astype(np.float64)
+
+
+def lagged_correlation(x, y, max_lag=8, min_periods=8):
+    """Correlation of every row of `x` with every row of `y` shifted by each lag.
+
+    `x` is (n_series, n_quarters) and `y` is (n_measures, n_quarters) on the same quarter
+    axis, with NaN gaps. Returns (r, n): arrays of shape (n_series, n_measures, n_lags)
+    with the correlation of x(t) and y(t + lag) for lag = -max_lag .. max_lag and the
+    number of quarters it is based on. Correlations from fewer than `min_periods`
+    quarters, or from a constant series, are NaN.
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    n_quarters = x.shape[1]
+    n_lags = 2 * max_lag + 1
+
+    # shifted[m * n_lags + j, t] = y[m, t + j - max_lag] (NaN outside the axis)
+    padded = np.full((len(y), n_quarters + 2 * max_lag), np.nan)
+    padded[:, max_lag:max_lag + n_quarters] = y
+    shifted = sliding_window_view(padded, n_quarters, axis=1).reshape(len(y) * n_lags, n_quarters)
+    y0, my = _centered(shifted)
+    y0_squared = y0 * y0
+
+    r = np.empty((len(x), len(y) * n_lags))
+    n = np.empty((len(x), len(y) * n_lags), dtype=np.int32)
+    for start in range(0, len(x), _BLOCK_ROWS):
+        x0, mx = _centered(x[start:start + _BLOCK_ROWS])
+        pairs = mx @ my.T
+        sum_x, sum_y = x0 @ my.T, mx @ y0.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = x0 @ y0.T - sum_x * sum_y / pairs
+            variance_x = (x0 * x0) @ my.T - sum_x * sum_x / pairs
+            variance_y = mx @ y0_squared.T - sum_y * sum_y / pairs
+            block = covariance / np.sqrt(variance_x * variance_y)
+        block[(pairs < max(min_periods, 2)) | ~np.isfinite(block)] = np.nan
+        r[start:start + _BLOCK_ROWS] = np.clip(block, -1, 1)
+        n[start:start + _BLOCK_ROWS] = pairs
+    return r.reshape(len(x), len(y), n_lags), n.reshape(len(x), len(y), n_lags)
+
+
+class LagCorrelation:
+    """Correlations of price series with CPI measures over a range of lags.
+
+    `r` and `n` are (n_series, n_measures, n_lags) arrays, `labels` names the series
+    (vectors or groups), `measures` the CPI columns and `lags` the lags in quarters.
+    """
+
+    def __init__(self, r, n, labels, measures, lags):
+        self.r = r
+        self.n = n
+        self.labels = list(labels)
+        self.measures = list(measures)
+        self.lags = np.asarray(lags)
+
+    def best(self, measure=None):
+        """Lag of the strongest (absolute) correlation per series and measure."""
+        measures = self.measures if measure is None else [measure]
+        frames = []
+        for measure in measures:
+            r = self.r[:, self.measures.index(measure)]
+            strength = np.where(np.isnan(r), -1, np.abs(r))
+            best = strength.argmax(axis=1)
+            rows = np.arange(len(r))
+            frames.append(pd.DataFrame({
+                'series': self.labels,
+                'measure': measure,
+                'lag': self.lags[best],
+                'r': r[rows, best],
+                'n': self.n[rows, self.measures.index(measure), best],
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    def top(self, measure, k):
+        """Labels of the `k` series most strongly correlated with `measure` at any lag."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            strength = np.nanmax(np.abs(self.matrix(measure)), axis=1)
+        return [self.labels[i] for i in top_k(strength, k)]
+
+    def matrix(self, measure):
+        """(n_series, n_lags) correlations with one measure, for a heatmap."""
+        return self.r[:, self.measures.index(measure)]
+
+    def to_long(self):
+        """One row per series, measure and lag."""
+        shape = self.r.shape
+        return pd.DataFrame({
+            'series': np.repeat(np.asarray(self.labels, dtype=object), shape[1] * shape[2]),
+            'measure': np.tile(np.repeat(self.measures, shape[2]), shape[0]),
+            'lag': np.tile(self.lags, shape[0] * shape[1]),
+            'r': self.r.ravel(),
+            'n': self.n.ravel(),
+        })
+
+
+def measures_on_axis(cpi_quarterly, quarters, measures=CPI_MEASURES):
+    """(n_measures, n_quarters) CPI matrix on a panel's quarter axis (NaN outside its range)."""
+    quarters = np.asarray(quarters)
+    offsets = cpi_quarterly['QUARTER'].to_numpy(dtype=np.int64) - int(quarters[0])
+    inside = (offsets >= 0) & (offsets < len(quarters))
+    matrix = np.full((len(measures), len(quarters)), np.nan)
+    matrix[:, offsets[inside]] = cpi_quarterly[list(measures)].to_numpy(dtype=np.float64)[inside].T
+    return matrix
+
+
+def correlate_panel(panel, cpi_quarterly, measures=CPI_MEASURES, max_lag=8, by=None,
+                    how='yoy', min_periods=8):
+    """LagCorrelation of a VectorPanel's series with the quarterly CPI measures.
+
+    Every vector is correlated unless `by` names a column of the panel's metadata
+    (e.g. NAPCS), in which case each group's pooled mean series is used instead. The
+    price series are first transformed with transform(`how`).
+    """
+    if by is None:
+        labels, matrix = panel.meta['VECTOR'].tolist(), panel.values
+    else:
+        labels, matrix = panel.group_mean(by)
+    y = measures_on_axis(cpi_quarterly, panel.quarters, measures)
+    r, n = lagged_correlation(transform(matrix, how), y, max_lag, min_periods)
+    return LagCorrelation(r, n, labels, measures, np.arange(-max_lag, max_lag + 1))
+
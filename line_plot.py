@@ -0,0 +1,103 @@
+# Fast line rendering for pre-aggregated time series
+# The charts used to hand long-format frames to sns.lineplot, which regroups the rows and
+# runs its estimator/error-bar machinery on data that is already one value per point,
+# or called it once per column. Here every series of a chart is drawn by a single
+# LineCollection, and series longer than the axes are in pixels are first reduced with
+# Largest-Triangle-Three-Buckets (LTTB) downsampling, which keeps the visual shape.
+import matplotlib
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+
+
+def lttb(x, y, n_out):
+    """Indices of the `n_out` points LTTB keeps from the series (x, y).
+
+    The first and last points are always kept; every bucket in between contributes the
+    point forming the largest triangle with the previously kept point and the mean of
+    the next bucket. Series with at most `n_out` points are returned whole.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Mean of the next bucket (the last point for the final bucket)
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        areas = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def _numeric_x(x):
+    # Dates are drawn in matplotlib's date units so the date locators/formatters apply
+    x = pd.Index(x)
+    if isinstance(x, pd.DatetimeIndex):
+        return mdates.date2num(x.to_numpy()), True
+    return x.to_numpy(dtype=np.float64), False
+
+
+def _pixel_width(ax):
+    figure = ax.get_figure()
+    return max(int(ax.get_position().width * figure.get_figwidth() * figure.dpi), 3)
+
+
+def plot_lines(ax, x, series, labels=None, max_points=None, colors=None, **line_kwargs):
+    """Draw every row of `series` against `x` with one LineCollection and return it.
+
+    `series` is a (n_series, n_points) array with NaN for missing values (gaps are
+    bridged, like a line through the observed points). Each labelled series also gets
+    an empty legend handle, so ax.legend() lists it as if it had been drawn by plot().
+    Series with more points than `max_points` (default: the axes width in pixels) are
+    downsampled with LTTB. Colors follow the matplotlib color cycle unless given.
+    """
+    series = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    x_values, is_date = _numeric_x(x)
+    max_points = max_points or _pixel_width(ax)
+    if colors is None:
+        cycle = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+        colors = [cycle[i % len(cycle)] for i in range(len(series))]
+
+    segments = []
+    for values in series:
+        observed = ~np.isnan(values)
+        xs, ys = x_values[observed], values[observed]
+        keep = lttb(xs, ys, max_points)
+        segments.append(np.column_stack([xs[keep], ys[keep]]))
+
+    lines = LineCollection(segments, colors=colors, **line_kwargs)
+    ax.add_collection(lines, autolim=True)
+    if is_date:
+        ax.xaxis_date()
+    ax.autoscale_view()
+
+    # Empty proxy lines carry the legend entries
+    for label, color in zip(labels if labels is not None else [], colors):
+        ax.plot([], [], color=color, label=str(label), **line_kwargs)
+    return lines
+
+
+def plot_frame(ax, df, x, y, hue, max_points=None, **line_kwargs):
+    """plot_lines() for a long frame with one row per (x, hue) pair, like sns.lineplot(hue=...).
+
+    Series keep seaborn's hue order (category order for categoricals, order of first
+    appearance otherwise) so the colors match the previous seaborn charts.
+    """
+    column = df[hue]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        labels = list(column.cat.categories)
+    else:
+        labels = list(pd.unique(column.dropna()))
+    wide = df.pivot_table(index=x, columns=hue, values=y, aggfunc='first', observed=True)
+    wide = wide.reindex(columns=labels).sort_index()
+    return plot_lines(ax, wide.index, wide.to_numpy().T, labels, max_points, **line_kwargs)
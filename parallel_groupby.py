@@ -0,0 +1,213 @@
+# Grouped aggregation over dense integer key codes, on one or several cores
+# Every group key is turned into small integer codes without factorizing: categorical
+# columns already carry them (cat.codes) and integer keys such as QUARTER are offsets from
+# their minimum. The codes of a row combine into one group id (mixed radix, which keeps the
+# key order), and count/sum/min/max come out of bincount and ufunc.at in linear time. This
+# beats pandas groupby several times over in a single process. For very large inputs the
+# code and value arrays are placed in multiprocessing.shared_memory blocks, each worker
+# process builds the group ids of a contiguous slice of rows itself and returns only the
+# per-group partials, which are merged in the parent. Nothing larger than the partials is
+# pickled and the rows are never reordered.
+#
+# Usage:
+#     from parallel_groupby import parallel_agg
+#     parallel_agg(rmpi, ['QUARTER', NAPCS], aggs=['mean'])
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+
+# Below this many rows pandas' fixed per-call costs are lower than the encoding's
+MIN_ENCODED_ROWS = 10_000
+
+# Worker processes pay off only from this many rows and this many workers. Measured at 1
+# to 20 million rows (benchmark.py compares the groupby_encoded and groupby_parallel
+# stages): copying the codes and values into shared memory, starting the pool and
+# merging the partials cost about 0.05 s + 0.024 s per million rows, while the work that
+# is split across the workers costs 0.043 s per million rows. Two workers never win;
+# four win from about ten million rows.
+MIN_PARALLEL_ROWS = 10_000_000
+MIN_PARALLEL_WORKERS = 4
+
+AGGREGATIONS = ['count', 'sum', 'min', 'max', 'mean']
+
+
+# === ENCODING ===
+def _key_codes(column):
+    # (codes, uniques) of one key column, codes are -1 where the key is missing
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = np.arange(len(column.cat.categories))
+        return column.cat.codes.to_numpy(), pd.Categorical.from_codes(categories, dtype=column.dtype)
+    values = column.to_numpy()
+    if values.dtype.kind in 'iu' and len(values):
+        low, high = int(values.min()), int(values.max())
+        # A dense integer key (e.g. the quarter ordinal) is its own code after an offset
+        if high - low < max(len(values), 1 << 16):
+            codes = (values - low).astype(np.int32 if high - low < 2 ** 31 else np.int64)
+            return codes, np.arange(low, high + 1, dtype=values.dtype)
+    codes, uniques = pd.factorize(column, sort=True)
+    return codes, uniques
+
+
+def _group_ids(codes, values, sizes):
+    # One int64 id per row with a present key and value; returns (ids, values)
+    valid = ~np.isnan(values)
+    for key_codes in codes:
+        valid &= key_codes >= 0
+    group_ids = np.zeros(int(valid.sum()), dtype=np.int64)
+    for key_codes, size in zip(codes, sizes):
+        group_ids *= size
+        group_ids += key_codes[valid]
+    return group_ids, values[valid]
+
+
+def _partials(group_ids, values):
+    """Per-group count/sum/min/max of `values` -> (group ids, (4, n_groups) array).
+
+    When the ids of the rows span a dense range, bincount and ufunc.at do it in linear
+    time; sparse ids fall back to sorting the rows and reducing each run of equal ids.
+    """
+    if not len(group_ids):
+        return group_ids[:0], np.empty((4, 0))
+    low, high = int(group_ids.min()), int(group_ids.max())
+    span = high - low + 1
+    if span <= max(4 * len(group_ids), 1 << 20):
+        offsets = group_ids - low
+        counts = np.bincount(offsets, minlength=span)
+        sums = np.bincount(offsets, weights=values, minlength=span)
+        minimum = np.full(span, np.inf)
+        maximum = np.full(span, -np.inf)
+        np.minimum.at(minimum, offsets, values)
+        np.maximum.at(maximum, offsets, values)
+        present = np.flatnonzero(counts)
+        stats = np.vstack([counts[present], sums[present], minimum[present], maximum[present]])
+        return present + low, stats
+
+    order = np.argsort(group_ids, kind='stable')
+    group_ids, values = group_ids[order], values[order]
+    starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+    counts = np.diff(np.r_[starts, len(group_ids)])
+    stats = np.vstack([
+        counts,
+        np.add.reduceat(values, starts),
+        np.minimum.reduceat(values, starts),
+        np.maximum.reduceat(values, starts),
+    ])
+    return group_ids[starts], stats
+
+
+# === WORKERS ===
+def _aggregate_slice(blocks, sizes, length, start, stop):
+    # Runs in a worker: attach to the shared blocks and aggregate rows [start, stop)
+    attached = [shared_memory.SharedMemory(name=name) for name, _ in blocks]
+    arrays = []
+    try:
+        arrays = [np.ndarray(length, dtype=dtype, buffer=block.buf)[start:stop]
+                  for block, (_, dtype) in zip(attached, blocks)]
+        group_ids, values = _group_ids(arrays[:-1], arrays[-1], sizes)
+        # The ids and values are fresh arrays, so the partials do not point into the blocks
+        return _partials(group_ids, values)
+    finally:
+        del arrays
+        for block in attached:
+            block.close()
+
+
+def _shared_copy(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block
+
+
+def _merge(results):
+    # The same group can appear in several slices; its partials are combined here
+    keys = np.concatenate([k for k, _ in results])
+    stats = np.hstack([s for _, s in results])
+    order = np.argsort(keys, kind='stable')
+    keys, stats = keys[order], stats[:, order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], np.intp)
+    if not len(starts):
+        return keys, stats
+    merged = np.vstack([
+        np.add.reduceat(stats[0], starts),
+        np.add.reduceat(stats[1], starts),
+        np.minimum.reduceat(stats[2], starts),
+        np.maximum.reduceat(stats[3], starts),
+    ])
+    return keys[starts], merged
+
+
+def _parallel_partials(codes, values, sizes, workers):
+    arrays = [*codes, values]
+    blocks = [_shared_copy(array) for array in arrays]
+    descriptors = [(block.name, array.dtype.str) for block, array in zip(blocks, arrays)]
+    bounds = np.linspace(0, len(values), workers + 1).astype(np.int64)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_aggregate_slice, descriptors, sizes, len(values), int(start), int(stop))
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return _merge(results) if results else (np.empty(0, np.int64), np.empty((4, 0)))
+
+
+# === AGGREGATION ===
+def _pandas_agg(df, by, value, aggs):
+    grouped = df.dropna(subset=[value]).groupby(by, observed=True, sort=True)[value]
+    return grouped.agg(list(aggs)).reset_index()
+
+
+def parallel_agg(df, by, value='VALUE', aggs=('mean',), workers=None, min_rows=MIN_ENCODED_ROWS,
+                 parallel_rows=MIN_PARALLEL_ROWS):
+    """groupby(by, observed=True)[value].agg(aggs).reset_index() over dense key codes.
+
+    Rows with a missing key or value are ignored, as pandas does, and the groups come out
+    in the same sorted order. Inputs smaller than `min_rows` go through pandas directly;
+    inputs of `parallel_rows` or more are cut into one contiguous row slice per worker
+    process and the per-slice partials are merged. `workers` defaults to one per core,
+    used only with at least MIN_PARALLEL_WORKERS cores.
+    Supported aggregations: count, sum, min, max and mean.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    aggs = [aggs] if isinstance(aggs, str) else list(aggs)
+    unknown = [a for a in aggs if a not in AGGREGATIONS]
+    if unknown:
+        raise ValueError(f'unknown aggregations {unknown}; expected some of {AGGREGATIONS}')
+    if len(df) < min_rows:
+        return _pandas_agg(df, by, value, aggs)
+    # An explicit worker count is honoured; the default only goes parallel where it pays off
+    fewest = 2 if workers else MIN_PARALLEL_WORKERS
+    workers = min(workers or os.cpu_count() or 1, 64)
+    parallel = workers >= fewest and len(df) >= parallel_rows
+
+    with stage('parallel_agg', rows_in=len(df), workers=workers if parallel else 1) as measured:
+        encoded = [_key_codes(df[key]) for key in by]
+        codes = [key_codes for key_codes, _ in encoded]
+        sizes = [max(len(uniques), 1) for _, uniques in encoded]
+        if np.prod([float(s) for s in sizes]) >= 2 ** 62:
+            raise ValueError(f'too many key combinations to encode {by} in one int64 group id')
+        values = df[value].to_numpy(dtype=np.float64, na_value=np.nan)
+        if parallel:
+            keys, stats = _parallel_partials(codes, values, sizes, workers)
+        else:
+            keys, stats = _partials(*_group_ids(codes, values, sizes))
+        measured.rows_out = len(keys)
+
+    # Decode the group ids back into key columns, in sorted key order like pandas
+    key_codes = np.unravel_index(keys, sizes)
+    result = pd.DataFrame({key: uniques.take(key_codes[i]) for i, (key, (_, uniques)) in enumerate(zip(by, encoded))})
+    columns = {'count': stats[0].astype(np.int64), 'sum': stats[1], 'min': stats[2], 'max': stats[3]}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        columns['mean'] = stats[1] / stats[0]
+    for agg in aggs:
+        result[agg] = columns[agg]
+    return result
@@ -0,0 +1,258 @@
+# Memoized DAG of the derived frames shared by the charts
+# Each step is a named function of its input steps (load -> clean -> filter -> aggregate).
+# A step's output is stored on disk under a hash of its code version, its parameters and
+# the keys of its inputs, so a parameter change only recomputes that step and the steps
+# downstream of it, and a new source CSV only recomputes the steps that depend on it.
+# The stored outputs, and the outputs kept in memory by this process, form size-bounded
+# caches with least-recently-used eviction.
+#
+# Usage:
+#     from pipeline import compute
+#     cpi_quarterly = compute('cpi_quarterly', start_year=2000)
+import functools
+import hashlib
+import inspect
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (CACHE_DIR, CACHE_VERSION, NAICS, SOURCES, dataset_fingerprint, feather,
+                         load_dataset, read_frame, save_frame)
+from hierarchy import Hierarchy
+from profiling import stage
+from quarters import to_ordinal
+from query import col, query
+
+STEP_DIR = CACHE_DIR / 'steps'
+
+# Upper bound of the stored step outputs, on disk and in memory; the least recently used
+# ones are removed first
+MAX_CACHE_BYTES = int(float(os.environ.get('PESTEL_STEP_CACHE_MB', 256)) * (1 << 20))
+
+# Core inflation measures averaged by the CPI charts
+CPI_MEASURES = ('STATIC_TOTALCPICHANGE', 'CPI_TRIM', 'CPI_MEDIAN', 'CPI_COMMON')
+
+
+class Step:
+    """A named function of other steps; keyword arguments after the inputs are its parameters."""
+
+    def __init__(self, name, function, inputs=(), version=1, source=None, reads=()):
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.version = version
+        self.source = source
+        # Source CSVs the function scans itself (e.g. through query.py) rather than via inputs
+        self.reads = tuple(reads)
+        # Source steps take no parameters; their key comes from the CSV content
+        parameters = [] if source else list(inspect.signature(function).parameters.values())[len(self.inputs):]
+        self.params = {p.name: p.default for p in parameters}
+
+
+STEPS = {}
+
+# Outputs already computed in this process, by step key, as (frame, bytes) in LRU order
+_MEMORY = OrderedDict()
+_memory_bytes = 0
+
+
+def step(name, inputs=(), version=1, reads=()):
+    """Register a step; bump `version` whenever its function changes what it returns.
+
+    `reads` lists the source tables the function queries directly, so that their
+    content is part of the step's key.
+    """
+    def register(function):
+        STEPS[name] = Step(name, function, inputs, version, reads=reads)
+        return function
+    return register
+
+
+# === KEYS ===
+def _upstream(name):
+    node = STEPS[name]
+    names = [name]
+    for upstream in node.inputs:
+        names += [n for n in _upstream(upstream) if n not in names]
+    return names
+
+
+def _key(name, params, keys):
+    if name in keys:
+        return keys[name]
+    node = STEPS[name]
+    parts = {
+        'step': name,
+        'version': node.version,
+        'params': {p: params.get(p, default) for p, default in node.params.items()},
+        'inputs': [_key(upstream, params, keys) for upstream in node.inputs],
+    }
+    if node.source:
+        # Source steps are keyed on the CSV content and the loader's cleaning rules
+        parts['source'] = [dataset_fingerprint(node.source), CACHE_VERSION]
+    if node.reads:
+        parts['reads'] = {source: dataset_fingerprint(source) for source in node.reads}
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    keys[name] = hashlib.sha256(encoded).hexdigest()
+    return keys[name]
+
+
+def step_key(name, **params):
+    """Hash identifying the output of `name` for the given parameters and current sources."""
+    return _key(name, params, {})
+
+
+# === EXECUTION ===
+def _recall(key):
+    if key not in _MEMORY:
+        return None
+    _MEMORY.move_to_end(key)
+    return _MEMORY[key][0]
+
+
+def _remember(key, df):
+    global _memory_bytes
+    if key in _MEMORY:
+        _memory_bytes -= _MEMORY.pop(key)[1]
+    size = int(df.memory_usage(deep=True).sum())
+    _MEMORY[key] = (df, size)
+    _memory_bytes += size
+    # Forget the least recently used outputs until the memo fits; the newest always stays
+    while _memory_bytes > MAX_CACHE_BYTES and len(_MEMORY) > 1:
+        _, (_, dropped) = _MEMORY.popitem(last=False)
+        _memory_bytes -= dropped
+
+
+def _step_path(name, key):
+    return STEP_DIR / f'{name}-{key[:20]}.arrow'
+
+
+def _compute(name, params, keys, memo=True):
+    key = _key(name, params, keys)
+    df = _recall(key)
+    if df is not None:
+        return df
+
+    node = STEPS[name]
+    path = _step_path(name, key)
+    stored = not node.source and feather is not None
+    # Without memo, only outputs at the default parameters are kept (a bounded set)
+    keep = memo or all(params.get(p, default) == default for p, default in parameters(name).items())
+    if stored and path.exists():
+        # Reading a stored output marks it as recently used (it may have just been evicted)
+        try:
+            os.utime(path)
+            df = read_frame(path)
+        except OSError:
+            df = None
+    if df is None:
+        inputs = [_compute(upstream, params, keys, memo) for upstream in node.inputs]
+        own = {p: params.get(p, default) for p, default in node.params.items()}
+        with stage(f'{name}.step', rows_in=sum(len(df) for df in inputs) if inputs else None) as measured:
+            df = node.function(*inputs, **own)
+            measured.rows_out = len(df)
+        if stored and keep:
+            save_frame(df, path, metadata={'step': name, 'key': key})
+            evict()
+    if keep:
+        _remember(key, df)
+    return df
+
+
+def parameters(name):
+    """{parameter: default} of every parameter compute(name) accepts."""
+    return {p: default for upstream in _upstream(name) for p, default in STEPS[upstream].params.items()}
+
+
+def compute(name, memo=True, **params):
+    """Output of step `name`, reusing memoized results of it and every step upstream.
+
+    Keyword arguments set step parameters by name (e.g. start_year for cpi_since) and
+    apply to whichever upstream step declares them; steps not declaring a parameter are
+    unaffected by it. The returned frame is shared, so callers must not modify it.
+    With memo=False, outputs that depend on a non-default parameter are neither kept in
+    memory nor stored on disk, for callers that cache them themselves.
+    """
+    known = parameters(name)
+    unknown = set(params) - set(known)
+    if unknown:
+        raise ValueError(f'{name}: unknown parameters {sorted(unknown)}; expected some of {sorted(known)}')
+    return _compute(name, params, {}, memo)
+
+
+# === CACHE MAINTENANCE ===
+def evict(max_bytes=None):
+    """Remove least recently used step outputs until the cache fits in `max_bytes`."""
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    files = []
+    for path in STEP_DIR.glob('*.arrow'):
+        try:
+            info = path.stat()
+        except FileNotFoundError:  # removed concurrently by another process
+            continue
+        files.append((info.st_mtime_ns, info.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files, key=lambda item: item[0]):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear_steps():
+    """Forget every memoized step output, in memory and on disk."""
+    global _memory_bytes
+    _MEMORY.clear()
+    _memory_bytes = 0
+    for path in STEP_DIR.glob('*.arrow'):
+        path.unlink(missing_ok=True)
+
+
+# === STEPS ===
+# Sources: the cleaned tables of data_loader (which keeps its own Arrow cache)
+for _name in SOURCES:
+    STEPS[_name] = Step(_name, functools.partial(load_dataset, _name), source=_name)
+
+
+@step('cpi_since', inputs=['cpi'])
+def cpi_since(cpi, start_year=1997):
+    """Monthly CPI rows from `start_year` onwards."""
+    return cpi[cpi['QUARTER'] >= to_ordinal(start_year)].reset_index(drop=True)
+
+
+@step('cpi_quarterly', inputs=['cpi_since'])
+def cpi_quarterly(cpi_since, measures=CPI_MEASURES):
+    """Quarterly mean of the CPI measures (Grafico3, Grafico8 and Grafico10)."""
+    return cpi_since.groupby('QUARTER')[list(measures)].mean().reset_index()
+
+
+@step('gdp_by_sector', reads=['gdp'], version=2)
+def gdp_by_sector():
+    """GDP summed per quarter and NAICS sector (grafico5 and Grafico7).
+
+    Scanned lazily from the CSV, reading only the date, NAICS and VALUE columns and
+    skipping rows without a value, instead of materializing the full GDP table.
+    """
+    totals = query('gdp').where(col('VALUE').notna()).groupby('QUARTER', NAICS).sum()
+    # Chunks carry their own categories, so the labels are re-encoded with sorted categories
+    totals[NAICS] = totals[NAICS].astype(str).astype('category')
+    return totals
+
+
+@step('gdp_all_industries', inputs=['gdp_by_sector'], version=2)
+def gdp_all_industries(gdp_by_sector, industry=None):
+    """Quarterly 'GDP' of all industries, or of one NAICS `industry` (label or code) (Grafico3).
+
+    Read from the NAICS hierarchy, which uses the published total (All industries [T001])
+    and never adds an aggregate to the sectors it contains.
+    """
+    tree = Hierarchy.from_frame(gdp_by_sector, NAICS)
+    values = tree.total() if industry is None else tree.series(industry)
+    observed = np.isfinite(values)
+    return pd.DataFrame({'QUARTER': tree.quarters[observed].astype(np.int32), 'GDP': values[observed]})
@@ -0,0 +1,187 @@
+# Pre-aggregated price-index cube (quarter x product x GEO) for RMPI and IPPI
+# Each cell stores count/sum/min/max/sum of squares of VALUE, which is everything the
+# price charts need: top-N by frequency or range and quarterly means across regions are
+# answered from a few thousand cells instead of a groupby over the long-format table.
+#
+# Cells are also keyed by VECTOR and carry a digest of their source rows, so a new
+# StatCan release is applied incrementally: quarters past each vector's last processed
+# REF_DATE are appended, and only cells whose rows were revised (VALUE/STATUS/SYMBOL)
+# are recomputed.
+import numpy as np
+import pandas as pd
+
+from data_loader import (CACHE_DIR, NAPCS, dataset_fingerprint, feather, frame_metadata,
+                         load_dataset, read_frame, save_frame)
+from profiling import stage
+
+# Bump whenever the cell layout changes so stale cubes are rebuilt
+CUBE_VERSION = 2
+
+CUBE_KEYS = ['QUARTER', NAPCS, 'GEO', 'VECTOR']
+MEASURES = ['count', 'sum', 'min', 'max', 'sumsq']
+
+# How each stored measure combines when cells are rolled up
+_ROLLUP = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'sumsq': 'sum'}
+
+# Row fields whose change marks a cell as revised
+_REVISION_FIELDS = ['VECTOR', 'QUARTER', 'VALUE', 'STATUS', 'SYMBOL']
+
+# Columns of the source table a cube is built from
+_SOURCE_COLUMNS = list(dict.fromkeys([*CUBE_KEYS, *_REVISION_FIELDS]))
+
+# Row hashes are truncated so that per-cell digest sums cannot overflow int64
+_DIGEST_MASK = (1 << 48) - 1
+
+
+def _row_digests(df):
+    fields = [c for c in _REVISION_FIELDS if c in df.columns]
+    hashes = pd.util.hash_pandas_object(df[fields], index=False).to_numpy()
+    return (hashes & np.uint64(_DIGEST_MASK)).astype(np.int64)
+
+
+class PriceCube:
+    """Materialized count/sum/min/max/sumsq of a value per (QUARTER, NAPCS, GEO, VECTOR) cell."""
+
+    def __init__(self, cells, keys=CUBE_KEYS):
+        self.cells = cells
+        self.keys = list(keys)
+
+    @classmethod
+    def from_frame(cls, df, keys=CUBE_KEYS, value='VALUE'):
+        """Aggregate a long-format table, ignoring rows with a missing value or product."""
+        keys = list(keys)
+        df = df.dropna(subset=[value, NAPCS] if NAPCS in keys else [value])
+        values = df[value].astype('float64')
+        # Cells are few, so categorical keys are stored as plain labels (no unused categories)
+        frame = df[keys].apply(
+            lambda column: column.astype(column.cat.categories.dtype)
+            if isinstance(column.dtype, pd.CategoricalDtype) else column
+        ).assign(_value=values, _square=values * values, _digest=_row_digests(df))
+        grouped = frame.groupby(keys, observed=True, dropna=False, sort=True)
+        cells = grouped['_value'].agg(['count', 'sum', 'min', 'max'])
+        cells['sumsq'] = grouped['_square'].sum()
+        cells['digest'] = grouped['_digest'].sum()
+        return cls(cells.reset_index(), keys)
+
+    # === INCREMENTAL UPDATES ===
+    def last_quarters(self):
+        """Last processed quarter per VECTOR."""
+        return self.cells.groupby('VECTOR', observed=True)['QUARTER'].max()
+
+    def apply_release(self, df, value='VALUE'):
+        """Return (updated cube, summary) for a newly published version of the table.
+
+        Rows after a vector's last processed quarter are aggregated and appended; for
+        earlier quarters only cells whose row digest changed are recomputed, and cells
+        that no longer have rows are dropped. Unchanged cells are kept as they are.
+        """
+        df = df.dropna(subset=[value, NAPCS])
+        last = df['VECTOR'].map(self.last_quarters())
+        appended = df['QUARTER'] > last.fillna(-1).to_numpy()
+        history = df[~appended]
+
+        # Compare per-cell digests of the historical rows with the stored ones
+        digests = history[self.keys].assign(_digest=_row_digests(history)).groupby(
+            self.keys, observed=True, dropna=False, sort=False)['_digest'].sum()
+        stored = self.cells.set_index(self.keys)['digest']
+        revised = digests.index[~digests.index.isin(stored.index) | (digests != stored.reindex(digests.index)).to_numpy()]
+        removed = stored.index.difference(digests.index)
+
+        # Recompute only the appended and revised cells from their rows
+        revised_rows = history.set_index(self.keys).index.isin(revised)
+        delta = PriceCube.from_frame(pd.concat([df[appended], history[revised_rows]]), self.keys, value)
+        keep = ~self.cells.set_index(self.keys).index.isin(revised.union(removed))
+        cells = pd.concat([self.cells[keep], delta.cells], ignore_index=True)
+        cells = cells.sort_values(self.keys, kind='stable', ignore_index=True)
+        summary = {
+            'appended_rows': int(appended.sum()),
+            'revised_cells': len(revised),
+            'removed_cells': len(removed),
+        }
+        return PriceCube(cells, self.keys), summary
+
+    # === ROLL-UPS ===
+    def rollup(self, by):
+        """Combine cells over every key not in `by` (e.g. rollup(['QUARTER', NAPCS]) drops GEO).
+
+        `by` may also name extra columns added to `cells`, such as a product classification.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        cells = self.cells.groupby(by, observed=True, dropna=False, sort=True)[MEASURES].agg(_ROLLUP)
+        return PriceCube(cells.reset_index(), by)
+
+    def stats(self, by=NAPCS):
+        """Per-group count, mean, std, min, max and range derived from the stored measures."""
+        cells = self.rollup(by).cells.set_index(by)
+        mean = cells['sum'] / cells['count']
+        variance = (cells['sumsq'] - cells['count'] * mean ** 2) / (cells['count'] - 1)
+        return pd.DataFrame({
+            'count': cells['count'],
+            'mean': mean,
+            'std': np.sqrt(variance.clip(lower=0)),
+            'min': cells['min'],
+            'max': cells['max'],
+            'range': cells['max'] - cells['min'],
+        })
+
+    # === CHART QUERIES ===
+    def top_by_frequency(self, n, by=NAPCS):
+        """The `n` groups with the most observations (Grafico1's value_counts().head(n))."""
+        return self.stats(by)['count'].sort_values(ascending=False, kind='stable').head(n).index.tolist()
+
+    def top_by_range(self, n, by=NAPCS):
+        """The `n` groups with the largest max - min spread (Grafico2/Grafico4)."""
+        return self.stats(by)['range'].sort_values(ascending=False, kind='stable').head(n).index.tolist()
+
+    def quarterly_mean(self, products=None, by=NAPCS, geo=None, value='VALUE'):
+        """Mean value per quarter and group, pooled across regions (or only the listed `geo`)."""
+        cube = self
+        if products is not None or geo is not None:
+            mask = pd.Series(True, index=self.cells.index)
+            if products is not None:
+                mask &= self.cells[by].isin(products)
+            if geo is not None:
+                mask &= self.cells['GEO'].isin(geo)
+            cube = PriceCube(self.cells[mask], self.keys)
+        cells = cube.rollup(['QUARTER', by]).cells
+        return cells[['QUARTER', by]].assign(**{value: cells['sum'] / cells['count']})
+
+
+# === STORAGE ===
+def _cube_path(name):
+    return CACHE_DIR / f'{name}.cube.arrow'
+
+
+def update_cube(name):
+    """Bring the stored cube of a price dataset up to date and return (cube, summary).
+
+    An unchanged CSV is served straight from disk. A changed CSV is applied to the stored
+    cube incrementally (see PriceCube.apply_release); the cube is built from scratch only
+    when none is stored yet or its layout version is outdated.
+    """
+    path = _cube_path(name)
+    fingerprint = dataset_fingerprint(name)
+    expected = {'cube_version': str(CUBE_VERSION), 'source_sha256': fingerprint}
+    metadata = (frame_metadata(path) or {}) if feather is not None and path.exists() else {}
+    if metadata and all(metadata.get(k) == v for k, v in expected.items()):
+        return PriceCube(read_frame(path)), {'status': 'unchanged'}
+
+    df = load_dataset(name, columns=_SOURCE_COLUMNS)
+    if metadata.get('cube_version') == str(CUBE_VERSION):
+        with stage(f'{name}.cube_update', rows_in=len(df)) as measured:
+            cube, summary = PriceCube(read_frame(path)).apply_release(df)
+            measured.rows_out = len(cube.cells)
+        summary['status'] = 'incremental'
+    else:
+        with stage(f'{name}.cube_build', rows_in=len(df)) as measured:
+            cube = PriceCube.from_frame(df)
+            measured.rows_out = len(cube.cells)
+        summary = {'status': 'rebuilt'}
+    if feather is not None:
+        save_frame(cube.cells, path, metadata=expected)
+    return cube, summary
+
+
+def load_cube(name):
+    """Return the up-to-date cube for a price dataset ('rmpi' or 'ippi')."""
+    return update_cube(name)[0]
@@ -0,0 +1,191 @@
+# Per-stage profiling for the data pipeline and the chart scripts
+# Wrap a stage in `with stage('rmpi.read_csv', rows_in=n) as s:` and, when profiling is on,
+# its wall time, CPU time, peak RSS growth, tracemalloc peak and input/output row counts
+# (set `s.rows_out` inside the block) are recorded.
+#
+# Profiling is controlled by environment variables read at import time:
+#     PESTEL_PROFILE=1                 print one line per stage to stderr
+#     PESTEL_PROFILE=profile.jsonl     append one JSON record per stage to the file
+#     PESTEL_PROFILE_TRACE=trace.json  also write a Chrome trace (chrome://tracing, Perfetto),
+#                                      started afresh by every run
+#     PESTEL_PROFILE_TRACEMALLOC=0     skip the tracemalloc peaks (they slow allocations down)
+# When neither is set, stage() returns a shared no-op object and nothing is measured.
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+_OUTPUT = os.environ.get('PESTEL_PROFILE', '').strip()
+_TRACE = os.environ.get('PESTEL_PROFILE_TRACE', '').strip()
+ENABLED = _OUTPUT not in ('', '0') or bool(_TRACE)
+_TRACEMALLOC = os.environ.get('PESTEL_PROFILE_TRACEMALLOC', '1').strip() != '0'
+
+# Set by the process that started the trace file, so that its worker processes append to it
+_TRACE_SESSION = '_PESTEL_PROFILE_TRACE_SESSION'
+
+# Open stages of the current thread, innermost last (for nested tracemalloc peaks)
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+class _NullStage:
+    """Stand-in returned by stage() when profiling is off; ignores everything.
+
+    One instance is shared by every stage, so row counts written to it are dropped
+    instead of being stored where an unrelated stage would read them back.
+    """
+
+    __slots__ = ()
+
+    @property
+    def rows_in(self):
+        return None
+
+    @rows_in.setter
+    def rows_in(self, value):
+        pass
+
+    @property
+    def rows_out(self):
+        return None
+
+    @rows_out.setter
+    def rows_out(self, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """One measured stage; set `rows_out` inside the block to record the output size."""
+
+    def __init__(self, name, rows_in=None, **fields):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.fields = fields
+        self._children_peak = 0
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self._traced_start = 0
+        if _TRACEMALLOC:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Resetting the peak would hide the parent's peak so far, so remember it first
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._children_peak = max(stack[-1]._children_peak, peak)
+            tracemalloc.reset_peak()
+            self._traced_start = current
+        stack.append(self)
+        self._rss_start = _peak_rss_mb()
+        self._cpu_start = time.process_time()
+        self._started_at = time.time()
+        self._wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        peak = max(tracemalloc.get_traced_memory()[1], self._children_peak) if _TRACEMALLOC else None
+        _local.stack.pop()
+        rss = _peak_rss_mb()
+        record = {
+            'stage': self.name,
+            'pid': os.getpid(),
+            'start_s': round(self._started_at, 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'peak_rss_mb': None if rss is None else round(rss, 2),
+            'rss_growth_mb': None if rss is None else round(rss - self._rss_start, 2),
+            'traced_peak_mb': None if peak is None else round((peak - self._traced_start) / (1 << 20), 3),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            **self.fields,
+        }
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _emit(record)
+        return False
+
+
+def _emit(record):
+    with _lock:
+        if _OUTPUT == '1':
+            print(f'[profile] {record["stage"]:<28} wall {record["wall_s"]:8.4f} s  cpu {record["cpu_s"]:8.4f} s  '
+                  f'traced {record["traced_peak_mb"]} MiB  rows {record["rows_in"]} -> {record["rows_out"]}',
+                  file=sys.stderr)
+        elif _OUTPUT not in ('', '0'):
+            # One JSON line per stage, appended so that worker processes can share the file
+            with open(_OUTPUT, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(record) + '\n')
+        if _TRACE:
+            _write_trace_event(record)
+
+
+def _start_trace():
+    # The first process of a run truncates the trace and writes the opening bracket before
+    # any event exists; worker processes inherit the marker and only append
+    path = os.path.abspath(_TRACE)
+    if os.environ.get(_TRACE_SESSION) == path:
+        return
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('[\n')
+    os.environ[_TRACE_SESSION] = path
+
+
+def _write_trace_event(record):
+    # Chrome's JSON array trace format tolerates a missing closing bracket, which lets
+    # every process append complete ('X') events to the same file; timestamps are wall
+    # clock microseconds so that worker processes line up
+    event = {
+        'name': record['stage'],
+        'ph': 'X',
+        'ts': round(record['start_s'] * 1e6, 1),
+        'dur': round(record['wall_s'] * 1e6, 1),
+        'pid': record['pid'],
+        'tid': threading.get_ident(),
+        'args': {k: v for k, v in record.items() if k not in ('stage', 'pid', 'start_s', 'wall_s')},
+    }
+    with open(_TRACE, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(event) + ',\n')
+
+
+def stage(name, rows_in=None, **fields):
+    """Context manager measuring one pipeline stage (a no-op when profiling is off).
+
+    Extra keyword arguments are stored with the record, e.g. stage('savefig', fmt='png').
+    """
+    if not ENABLED:
+        return _NULL_STAGE
+    return Stage(name, rows_in, **fields)
+
+
+
+if _TRACE:
+    _start_trace()
@@ -0,0 +1,124 @@
+# Wide quarterly panel aligning RMPI, IPPI, GDP and CPI on the integer quarter key
+# Every source is first reduced to one row per quarter (CPI monthly -> quarterly means,
+# GDP "All industries" sums, RMPI/IPPI mean index across products and regions) by the
+# memoized pipeline steps and price cubes. Because the quarter ordinals are consecutive
+# integers, all series are then joined in a single pass by scattering each one into a
+# dense array indexed by `quarter - first quarter`, which is a linear-time merge of the
+# sorted keys with no string conversion and no chain of pairwise pd.merge calls.
+#
+# Usage:
+#     from quarterly_panel import build_panel
+#     panel = build_panel(['cpi', 'gdp', 'rmpi'], how='inner', start_year=2000)
+import numpy as np
+import pandas as pd
+
+from pipeline import compute, parameters
+from price_cube import load_cube
+
+HOW = ('outer', 'inner')
+
+
+# === ALIGNMENT ===
+def _sorted_keys(frame, key):
+    keys = frame[key].to_numpy(dtype=np.int64)
+    if len(keys) > 1 and not (np.diff(keys) > 0).all():
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        if (np.diff(keys) == 0).any():
+            raise ValueError(f'duplicate {key} values; aggregate each frame to one row per {key} first')
+        frame = frame.iloc[order]
+    return frame, keys
+
+
+def align(frames, how='outer', tolerance=0, key='QUARTER'):
+    """Join frames keyed by a unique integer `key` into one wide frame sorted by `key`.
+
+    how='outer' keeps every quarter present in any frame, how='inner' only the quarters
+    present in all of them; missing values are NaN. With `tolerance` > 0 a frame's last
+    value is carried forward for up to that many quarters (an as-of join), e.g. to line
+    up a series published with a lag. Value columns must be numeric and their names
+    unique across frames.
+    """
+    if how not in HOW:
+        raise ValueError(f'unknown join {how!r}; expected one of {HOW}')
+    columns = [c for frame in frames for c in frame.columns if c != key]
+    duplicated = sorted({c for c in columns if columns.count(c) > 1})
+    if duplicated:
+        raise ValueError(f'columns {duplicated} appear in several frames')
+
+    sorted_frames = [_sorted_keys(frame, key) for frame in frames]
+    non_empty = [keys for _, keys in sorted_frames if len(keys)]
+    if not non_empty:
+        return pd.DataFrame({key: np.array([], dtype=np.int32), **{c: np.array([], dtype=np.float64) for c in columns}})
+    first = min(int(keys[0]) for keys in non_empty)
+    span = max(int(keys[-1]) for keys in non_empty) - first + 1
+    positions = np.arange(span)
+
+    # Scatter every frame into dense arrays over the quarter range
+    present, dense = [], {}
+    for frame, keys in sorted_frames:
+        offsets = keys - first
+        observed = np.zeros(span, dtype=bool)
+        observed[offsets] = True
+        source = positions
+        if tolerance:
+            # Position of the latest observed quarter at or before each quarter
+            latest = np.maximum.accumulate(np.where(observed, positions, -1))
+            observed = (latest >= 0) & (positions - latest <= tolerance)
+            source = np.where(observed, latest, 0)
+        present.append(observed)
+        for column in frame.columns.drop(key):
+            values = np.full(span, np.nan)
+            values[offsets] = frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            dense[column] = np.where(observed, values[source], np.nan)
+
+    # Outer keeps quarters any frame covers, inner those all frames cover
+    present = np.vstack(present)
+    rows = present.any(axis=0) if how == 'outer' else present.all(axis=0)
+    result = {key: (positions[rows] + first).astype(np.int32)}
+    result.update({column: values[rows] for column, values in dense.items()})
+    return pd.DataFrame(result)
+
+
+# === SOURCES ===
+def _cube_mean(name, column):
+    # Mean index over every product and region of the price cube, per quarter
+    cells = load_cube(name).rollup('QUARTER').cells
+    return pd.DataFrame({'QUARTER': cells['QUARTER'], column: cells['sum'] / cells['count']})
+
+
+# Pipeline step giving one row per quarter of each source (None: mean of its price cube)
+SERIES = {
+    'cpi': 'cpi_quarterly',
+    'gdp': 'gdp_all_industries',
+    'rmpi': None,
+    'ippi': None,
+}
+
+
+def series(name, **params):
+    """Quarterly frame ['QUARTER', columns...] of one source of SERIES.
+
+    Parameters of the source's pipeline step (e.g. start_year for 'cpi', industry for
+    'gdp') are passed on to it; other parameters are ignored.
+    """
+    step = SERIES[name]
+    if step is None:
+        return _cube_mean(name, name.upper())
+    own = parameters(step)
+    return compute(step, **{p: v for p, v in params.items() if p in own})
+
+
+def build_panel(sources=tuple(SERIES), how='outer', tolerance=0, **params):
+    """Wide quarterly panel of the given sources (see align() for `how` and `tolerance`).
+
+    Columns are QUARTER, the CPI measures, GDP, RMPI and IPPI (for the selected sources).
+    Keyword arguments set pipeline step parameters, such as start_year for the CPI.
+    """
+    unknown = set(sources) - set(SERIES)
+    if unknown:
+        raise ValueError(f'unknown sources {sorted(unknown)}; expected some of {list(SERIES)}')
+    known = {p for name in sources if SERIES[name] for p in parameters(SERIES[name])}
+    if set(params) - known:
+        raise ValueError(f'unknown parameters {sorted(set(params) - known)}; expected some of {sorted(known)}')
+    return align([series(name, **params) for name in sources], how=how, tolerance=tolerance)
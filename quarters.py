@@ -0,0 +1,72 @@
+# Quarter normalization shared by every dataset
+# Dates are reduced to a compact integer quarter ordinal (year * 4 + quarter - 1) so
+# groupbys and joins run on int keys; timestamps are only produced at plot time.
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# StatCan labels come as '1997Q1', '1997-01' or '1997-01-01'
+_QUARTER_LABEL = re.compile(r'^\s*(\d{4})\s*-?\s*Q([1-4])\s*$', re.IGNORECASE)
+_MONTH_LABEL = re.compile(r'^\s*(\d{4})-(\d{1,2})(?:-\d{1,2})?\s*$')
+
+
+def to_ordinal(year, quarter=1):
+    """Quarter ordinal for a calendar year and quarter (1-4)."""
+    return year * 4 + quarter - 1
+
+
+@lru_cache(maxsize=None)
+def parse_quarter(label):
+    """Quarter ordinal for a single date label; results are memoized per label."""
+    match = _QUARTER_LABEL.match(label)
+    if match:
+        return to_ordinal(int(match.group(1)), int(match.group(2)))
+    match = _MONTH_LABEL.match(label)
+    if match:
+        return to_ordinal(int(match.group(1)), (int(match.group(2)) - 1) // 3 + 1)
+    period = pd.Period(label, freq='Q')
+    return to_ordinal(period.year, period.quarter)
+
+
+def quarter_ordinal(values):
+    """Map dates or date labels to int32 quarter ordinals.
+
+    Datetime input is converted arithmetically; text labels are factorized so each
+    distinct label is parsed only once, then broadcast back to every row.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.isna().any():
+            raise ValueError('cannot convert missing dates to quarter ordinals')
+        ordinals = series.dt.year.to_numpy() * 4 + (series.dt.month.to_numpy() - 1) // 3
+        return pd.Series(ordinals.astype(np.int32), index=series.index, name=series.name)
+
+    codes, uniques = pd.factorize(series)
+    if (codes < 0).any():
+        raise ValueError('cannot convert missing date labels to quarter ordinals')
+    unique_ordinals = np.fromiter((parse_quarter(str(label)) for label in uniques), dtype=np.int32, count=len(uniques))
+    return pd.Series(unique_ordinals[codes], index=series.index, name=series.name)
+
+
+def quarter_to_timestamp(ordinals):
+    """Quarter-start timestamps for an array or Series of quarter ordinals."""
+    values = np.asarray(ordinals, dtype=np.int64)
+    months = (values // 4 - 1970) * 12 + (values % 4) * 3
+    timestamps = months.astype('datetime64[M]').astype('datetime64[ns]')
+    if isinstance(ordinals, pd.Series):
+        return pd.Series(timestamps, index=ordinals.index, name=ordinals.name)
+    return pd.DatetimeIndex(timestamps)
+
+
+def quarter_to_label(ordinals, fmt='{year}Q{quarter}'):
+    """Text labels such as '1997Q1' for an array or Series of quarter ordinals."""
+    values = np.asarray(ordinals, dtype=np.int64)
+    # Format each distinct quarter once
+    uniques, inverse = np.unique(values, return_inverse=True)
+    labels = np.array([fmt.format(year=v // 4, quarter=v % 4 + 1) for v in uniques], dtype=object)
+    result = labels[inverse.reshape(-1)] if len(values) else labels
+    if isinstance(ordinals, pd.Series):
+        return pd.Series(result, index=ordinals.index, name=ordinals.name)
+    return result
@@ -0,0 +1,450 @@
+# Lazy queries over the source tables with projection and predicate pushdown
+# A query only records what is asked (filters, selected columns, grouping); nothing is
+# read until it is collected. The planner then reads just the columns the query uses,
+# turns missing-value, GEO and quarter-range filters into reader options, evaluates the
+# remaining predicates chunk by chunk and keeps only partial aggregates between chunks.
+#
+# Usage:
+#     from query import col, rmpi
+#     top = rmpi().where(col('VALUE').notna()).top(6, by=NAPCS)
+#     top.groupby('QUARTER', NAPCS).mean()
+import math
+import numbers
+import operator
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from data_loader import NAPCS, SOURCES
+from parallel_groupby import parallel_agg
+from streaming import DEFAULT_CHUNKSIZE, _PARTIALS, iter_chunks, merge_partials
+
+# Aggregations computed from the mergeable partials of streaming.py
+AGGREGATIONS = ['sum', 'count', 'min', 'max', 'mean', 'range']
+
+_OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '>=': operator.ge, '>': operator.gt,
+    '<=': operator.le, '<': operator.lt,
+}
+
+
+# === EXPRESSIONS ===
+class Expr:
+    """Row predicate evaluated on a chunk; combine with & and negate with ~."""
+
+    def columns(self):
+        raise NotImplementedError
+
+    def evaluate(self, chunk):
+        raise NotImplementedError
+
+    def conjuncts(self):
+        return [self]
+
+    def __and__(self, other):
+        return And([self, other])
+
+    def __invert__(self):
+        return Not(self)
+
+
+class Compare(Expr):
+    def __init__(self, column, op, value):
+        self.column, self.op, self.value = column, op, value
+
+    def columns(self):
+        return {self.column}
+
+    def evaluate(self, chunk):
+        return _OPERATORS[self.op](chunk[self.column], self.value)
+
+    def __repr__(self):
+        return f'{self.column} {self.op} {self.value!r}'
+
+
+class IsIn(Expr):
+    def __init__(self, column, values):
+        self.column, self.values = column, list(values)
+
+    def columns(self):
+        return {self.column}
+
+    def evaluate(self, chunk):
+        return chunk[self.column].isin(self.values)
+
+    def __repr__(self):
+        shown = self.values if len(self.values) <= 4 else self.values[:4] + ['...']
+        return f'{self.column} in {shown}'
+
+
+class NotNull(Expr):
+    def __init__(self, column):
+        self.column = column
+
+    def columns(self):
+        return {self.column}
+
+    def evaluate(self, chunk):
+        return chunk[self.column].notna()
+
+    def __repr__(self):
+        return f'{self.column} is not null'
+
+
+class Contains(Expr):
+    def __init__(self, column, text, case=False):
+        self.column, self.text, self.case = column, text, case
+
+    def columns(self):
+        return {self.column}
+
+    def evaluate(self, chunk):
+        return chunk[self.column].astype(str).str.contains(self.text, case=self.case, regex=False)
+
+    def __repr__(self):
+        return f'{self.column} contains {self.text!r}'
+
+
+class And(Expr):
+    def __init__(self, parts):
+        self.parts = [c for part in parts for c in part.conjuncts()]
+
+    def conjuncts(self):
+        return list(self.parts)
+
+    def columns(self):
+        return set().union(*(part.columns() for part in self.parts))
+
+    def evaluate(self, chunk):
+        mask = self.parts[0].evaluate(chunk)
+        for part in self.parts[1:]:
+            mask &= part.evaluate(chunk)
+        return mask
+
+    def __repr__(self):
+        return ' and '.join(f'({part!r})' for part in self.parts)
+
+
+class Not(Expr):
+    def __init__(self, part):
+        self.part = part
+
+    def columns(self):
+        return self.part.columns()
+
+    def evaluate(self, chunk):
+        return ~self.part.evaluate(chunk)
+
+    def __repr__(self):
+        return f'not ({self.part!r})'
+
+
+class TopN(Expr):
+    """Keep the `n` groups of `by` ranked highest by an aggregate of `value`.
+
+    Resolved into an IsIn predicate when the plan is built, by a grouped pass of the
+    query it was attached to (which reads only `by`, `value` and the filter columns).
+    """
+
+    def __init__(self, query, n, by, rank, value):
+        self.query, self.n, self.by, self.rank, self.value = query, n, by, rank, value
+
+    def columns(self):
+        return {self.by}
+
+    def resolve(self, **options):
+        scores = self.query.groupby(self.by).agg(self.rank, value=self.value, **options)
+        ranked = scores.set_index(self.by)[self.rank].sort_values(ascending=False, kind='stable')
+        return IsIn(self.by, ranked.head(self.n).index.tolist())
+
+    def __repr__(self):
+        return f'{self.by} in top {self.n} by {self.rank}({self.value})'
+
+
+class Column:
+    """Column reference used to build predicates, e.g. col('GEO').isin([...])."""
+
+    __hash__ = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def isin(self, values):
+        return IsIn(self.name, values)
+
+    def notna(self):
+        return NotNull(self.name)
+
+    def contains(self, text, case=False):
+        return Contains(self.name, text, case)
+
+    def between(self, low, high):
+        return Compare(self.name, '>=', low) & Compare(self.name, '<=', high)
+
+    def __eq__(self, value):
+        return Compare(self.name, '==', value)
+
+    def __ne__(self, value):
+        return Compare(self.name, '!=', value)
+
+    def __ge__(self, value):
+        return Compare(self.name, '>=', value)
+
+    def __gt__(self, value):
+        return Compare(self.name, '>', value)
+
+    def __le__(self, value):
+        return Compare(self.name, '<=', value)
+
+    def __lt__(self, value):
+        return Compare(self.name, '<', value)
+
+
+def col(name):
+    """Reference a cleaned column of the source table (or the derived 'QUARTER' key)."""
+    return Column(name)
+
+
+# === PLANNING ===
+class Plan:
+    """Reader options after pushdown plus the predicate left for per-chunk evaluation."""
+
+    def __init__(self, name, columns, dropna, geo, start, end, residual):
+        self.name = name
+        self.columns = columns
+        self.dropna = dropna
+        self.geo = geo
+        self.start = start
+        self.end = end
+        self.residual = residual
+
+    def chunks(self, chunksize=DEFAULT_CHUNKSIZE):
+        where = self.residual.evaluate if self.residual is not None else None
+        return iter_chunks(self.name, columns=self.columns, dropna=self.dropna or None, geo=self.geo,
+                           start=self.start, end=self.end, where=where, chunksize=chunksize)
+
+    def __repr__(self):
+        lines = [f'scan {self.name}', f'  columns: {self.columns if self.columns is not None else "all"}']
+        if self.dropna:
+            lines.append(f'  drop missing: {self.dropna}')
+        if self.geo is not None:
+            lines.append(f'  GEO in: {self.geo}')
+        if self.start is not None or self.end is not None:
+            lines.append(f'  QUARTER between: {self.start} and {self.end}')
+        if self.residual is not None:
+            lines.append(f'  per-chunk filter: {self.residual!r}')
+        return '\n'.join(lines)
+
+
+def _quarter_bound(predicate):
+    # Comparisons of QUARTER with a finite number become reader bounds; others stay filters
+    if not isinstance(predicate, Compare) or predicate.column != 'QUARTER' or predicate.op == '!=':
+        return False
+    value = predicate.value
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _push_down(name, predicates, needed, options, resolve=True):
+    dropna, geo, start, end, residual = [], None, None, None, []
+    for predicate in [c for p in predicates for c in p.conjuncts()]:
+        if isinstance(predicate, TopN) and resolve:
+            predicate = predicate.resolve(**options)
+        if isinstance(predicate, NotNull) and predicate.column != 'QUARTER':
+            dropna.append(predicate.column)
+        elif isinstance(predicate, IsIn) and predicate.column == 'GEO':
+            geo = predicate.values if geo is None else [g for g in geo if g in predicate.values]
+        elif _quarter_bound(predicate):
+            # QUARTER is an integer key, so any finite bound becomes an inclusive integer one
+            value = predicate.value
+            low = {'>=': math.ceil(value), '>': math.floor(value) + 1, '==': math.ceil(value)}.get(predicate.op)
+            high = {'<=': math.floor(value), '<': math.ceil(value) - 1, '==': math.floor(value)}.get(predicate.op)
+            start = low if start is None or (low is not None and low > start) else start
+            end = high if end is None or (high is not None and high < end) else end
+        else:
+            residual.append(predicate)
+
+    columns = None
+    if needed is not None:
+        used = set(needed) | set(dropna) | set().union(*(p.columns() for p in residual))
+        columns = [c for c in dict.fromkeys([*needed, *sorted(used)]) if c != 'QUARTER']
+    return Plan(name, columns, list(dict.fromkeys(dropna)), geo, start, end,
+                And(residual) if residual else None)
+
+
+def _execute(plan, consume, executor='chunked', workers=None, chunksize=DEFAULT_CHUNKSIZE, fold=None):
+    # Chunks are parsed in order; with executor='threads' the per-chunk work (filtering
+    # is done by the reader, consume() does the projection or partial aggregation) runs
+    # in a thread pool while the next chunk is being parsed. Without `fold` the results
+    # are returned as a list in chunk order; with it they are combined as they arrive
+    # (fold(None, first), then fold(total, next)) and only the total is returned.
+    if executor == 'chunked':
+        results = (consume(chunk) for chunk in plan.chunks(chunksize))
+        if fold is None:
+            return list(results)
+        total = None
+        for result in results:
+            total = fold(total, result)
+        return total
+    if executor != 'threads':
+        raise ValueError(f"unknown executor {executor!r}; expected 'chunked' or 'threads'")
+
+    # At most two chunks per thread are parsed ahead, so memory stays bounded however
+    # large the table is; the reader waits for the oldest (or any, when folding) chunk
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    window = 2 * workers
+    results, total = [], None
+    in_flight = deque()
+
+    def drain(limit):
+        nonlocal total
+        while len(in_flight) > limit:
+            if fold is None:
+                results.append(in_flight.popleft().result())
+                continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.remove(future)
+                total = fold(total, future.result())
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in plan.chunks(chunksize):
+            in_flight.append(pool.submit(consume, chunk))
+            drain(window - 1)
+        drain(0)
+    return results if fold is None else total
+
+
+# === QUERIES ===
+class Query:
+    """Immutable lazy query over one source table ('rmpi', 'ippi', 'gdp' or 'cpi')."""
+
+    def __init__(self, name, predicates=(), selected=None):
+        if name not in SOURCES:
+            raise ValueError(f'unknown dataset {name!r}; expected one of {list(SOURCES)}')
+        self.name = name
+        self.predicates = tuple(predicates)
+        self.selected = selected
+
+    def where(self, *predicates):
+        """Keep rows matching every predicate."""
+        return Query(self.name, self.predicates + predicates, self.selected)
+
+    def select(self, *columns):
+        """Keep only the listed columns ('QUARTER' is always available)."""
+        return Query(self.name, self.predicates, list(columns))
+
+    def dropna(self, *columns):
+        """Drop rows missing any of the listed columns (pushed into the reader)."""
+        return self.where(*[NotNull(c) for c in columns])
+
+    def top(self, n, by=NAPCS, rank='count', value='VALUE'):
+        """Keep the `n` groups of `by` with the highest `rank` aggregate of `value`.
+
+        rank='count' matches the value_counts().head(n) selection of Grafico1 on rows
+        that pass the earlier filters, 'range' the max - min ranking of Grafico2/4 and
+        'sum' the cumulative GDP ranking of grafico5/7.
+        """
+        if rank not in AGGREGATIONS:
+            raise ValueError(f'unknown ranking {rank!r}; expected one of {AGGREGATIONS}')
+        return self.where(TopN(self, n, by, rank, value))
+
+    def groupby(self, *keys):
+        return GroupedQuery(self, list(keys))
+
+    def plan(self, needed=None, resolve=True, **options):
+        """The pushed-down Plan reading `needed` columns (the selection by default).
+
+        Top-N predicates are resolved by running their ranking pass unless `resolve` is False.
+        """
+        needed = needed if needed is not None else self.selected
+        return _push_down(self.name, self.predicates, needed, options, resolve)
+
+    def explain(self):
+        """Describe the plan without reading any data."""
+        return repr(self.plan(resolve=False))
+
+    def collect(self, executor='chunked', workers=None, chunksize=DEFAULT_CHUNKSIZE):
+        """Run the query and return the matching rows."""
+        options = {'executor': executor, 'workers': workers, 'chunksize': chunksize}
+        plan = self.plan(**options)
+        columns = None if self.selected is None else list(dict.fromkeys(['QUARTER', *self.selected]))
+        parts = _execute(plan, lambda chunk: chunk if columns is None else chunk[columns], **options)
+        if not parts:
+            return pd.DataFrame(columns=columns or [])
+        return pd.concat(parts, ignore_index=True)
+
+
+class GroupedQuery:
+    """Grouped aggregation of a Query, computed from per-chunk partial aggregates."""
+
+    def __init__(self, query, keys):
+        self.query = query
+        self.keys = keys
+
+    def explain(self, value='VALUE'):
+        """Describe the plan of an aggregation of `value` without reading any data."""
+        return repr(self.query.plan([*self.keys, value], resolve=False))
+
+    def agg(self, *functions, value='VALUE', executor='chunked', workers=None, chunksize=DEFAULT_CHUNKSIZE):
+        """One row per group with a column per requested aggregation of `value`."""
+        unknown = [f for f in functions if f not in AGGREGATIONS]
+        if unknown:
+            raise ValueError(f'unknown aggregations {unknown}; expected some of {AGGREGATIONS}')
+        options = {'executor': executor, 'workers': workers, 'chunksize': chunksize}
+        plan = self.query.plan([*self.keys, value], **options)
+        keys, partials = self.keys, list(_PARTIALS)
+
+        def consume(chunk):
+            # Partials of the chunk from the dense key codes of parallel_groupby.py (in this
+            # process: chunks are far below the size where worker processes pay off); sums
+            # are accumulated in float64 whatever the column's storage dtype
+            return parallel_agg(chunk, keys, value, aggs=partials, workers=1).set_index(keys)
+
+        totals = _execute(plan, consume, fold=merge_partials, **options)
+        if totals is None:
+            totals = pd.DataFrame(columns=partials, index=pd.MultiIndex.from_arrays([[]] * len(keys), names=keys))
+        totals['mean'] = totals['sum'] / totals['count']
+        totals['range'] = totals['max'] - totals['min']
+        return totals[list(functions)].sort_index().reset_index()
+
+    def _single(self, function, value, **options):
+        return self.agg(function, value=value, **options).rename(columns={function: value})
+
+    def mean(self, value='VALUE', **options):
+        return self._single('mean', value, **options)
+
+    def sum(self, value='VALUE', **options):
+        return self._single('sum', value, **options)
+
+    def count(self, value='VALUE', **options):
+        return self._single('count', value, **options)
+
+    def min(self, value='VALUE', **options):
+        return self._single('min', value, **options)
+
+    def max(self, value='VALUE', **options):
+        return self._single('max', value, **options)
+
+
+def query(name):
+    """Start a lazy query over a source table."""
+    return Query(name)
+
+
+def rmpi():
+    return Query('rmpi')
+
+
+def ippi():
+    return Query('ippi')
+
+
+def gdp():
+    return Query('gdp')
+
+
+def cpi():
+    return Query('cpi')
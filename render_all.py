@@ -0,0 +1,146 @@
+# Headless batch renderer for the full PESTEL chart set
+# Runs every chart's build_chart() on the Agg backend, loads each dataset once and
+# shares it with a pool of worker processes, then saves PNG/SVG/PDF files to disk.
+#
+# Usage:
+#     python render_all.py --output-dir charts --formats png svg pdf --jobs 4
+import argparse
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from change_points import update_breaks
+from pipeline import compute, parameters
+from price_cube import load_cube
+from profiling import stage
+from vector_panel import load_panel
+
+# Chart modules in presentation order (file names are kept as published)
+CHARTS = [
+    'Grafico1',
+    'Grafico2',
+    'Grafico3',
+    'Grafico4',
+    'grafico5',
+    'Grafico6',
+    'Grafico7',
+    'Grafico8',
+    'Grafico10',
+    'Grafico11',
+]
+
+# Datasets shared with the worker processes (inherited on fork, sent once per worker otherwise)
+_DATASETS = {}
+
+
+def _init_worker(datasets):
+    global _DATASETS
+    _DATASETS = datasets
+    matplotlib.use('Agg')
+
+
+def render_chart(name, output_dir, formats):
+    """Build one chart from the shared datasets and save it in every requested format."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with stage(f'{name}.build_chart'):
+        fig = module.build_chart(*[_DATASETS[dataset] for dataset in module.DATASETS])
+    paths = []
+    for fmt in formats:
+        path = Path(output_dir) / f'{name}.{fmt}'
+        with stage(f'{name}.savefig', format=fmt):
+            fig.savefig(path, format=fmt, bbox_inches='tight')
+        paths.append(str(path))
+    plt.close(fig)
+    return name, time.perf_counter() - start, paths
+
+
+# '<source>_cube', '<source>_panel' and '<source>_breaks' name the pre-aggregated price
+# cube, the vector x quarter panel and the change-point detector of a source (see
+# price_cube.py, vector_panel.py and change_points.py); any other name is a source table
+# or a derived step of pipeline.py
+_SOURCE_LOADERS = {'_cube': load_cube, '_panel': load_panel, '_breaks': update_breaks}
+
+
+def dataset_parameters(dataset):
+    """{parameter: default} accepted by a dataset (only pipeline steps take parameters)."""
+    if dataset.endswith(tuple(_SOURCE_LOADERS)):
+        return {}
+    return parameters(dataset)
+
+
+def _load(dataset, memo=True, **params):
+    for suffix, load in _SOURCE_LOADERS.items():
+        if dataset.endswith(suffix):
+            return load(dataset[:-len(suffix)])
+    return compute(dataset, memo=memo, **params)
+
+
+def load_shared_datasets(charts):
+    """Load each dataset needed by the selected charts exactly once."""
+    datasets, missing = {}, {}
+    for name in charts:
+        for dataset in importlib.import_module(name).DATASETS:
+            if dataset in datasets or dataset in missing:
+                continue
+            try:
+                with stage(f'{dataset}.load'):
+                    datasets[dataset] = _load(dataset)
+            except FileNotFoundError as error:
+                missing[dataset] = error
+    return datasets, missing
+
+
+def render_all(output_dir='charts', formats=('png',), charts=CHARTS, jobs=None):
+    """Render the selected charts in parallel and return {chart: seconds or error message}."""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    datasets, missing = load_shared_datasets(charts)
+
+    # Charts whose source CSV is not available are reported instead of failing the batch
+    results, runnable = {}, []
+    for name in charts:
+        absent = [d for d in importlib.import_module(name).DATASETS if d in missing]
+        if absent:
+            results[name] = f'skipped (missing {", ".join(absent)} dataset)'
+        else:
+            runnable.append(name)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(datasets,)) as pool:
+        futures = {pool.submit(render_chart, name, output_dir, formats): name for name in runnable}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()[1]
+            except Exception as error:  # one broken chart must not abort the others
+                results[name] = f'failed ({type(error).__name__}: {error})'
+    return {name: results[name] for name in charts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render every PESTEL chart without a display.')
+    parser.add_argument('--output-dir', default='charts', help='folder for the rendered files')
+    parser.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--charts', nargs='+', default=CHARTS, choices=CHARTS)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = render_all(args.output_dir, args.formats, args.charts, args.jobs)
+
+    # Report wall-clock time per chart
+    for name, result in results.items():
+        if isinstance(result, float):
+            print(f'{name:<10} {result:8.2f} s')
+        else:
+            print(f'{name:<10} {result}')
+    print(f'{"total":<10} {time.perf_counter() - start:8.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Declarative schemas for the source datasets
+# Each schema lists the header the file is expected to have (after whitespace/BOM
+# cleanup), the columns actually parsed with their compact dtypes, and the columns
+# that must be present in every row. The loader applies the projection and dtypes at
+# parse time and raises SchemaError as soon as a new release changes the layout.
+
+NAPCS = 'North American Product Classification System (NAPCS)'
+NAICS = 'North American Industry Classification System (NAICS)'
+
+
+class SchemaError(ValueError):
+    """A source file does not match its declared schema."""
+
+
+# Standard StatCan table layout shared by the price index files
+_STATCAN_TAIL = ['UOM', 'UOM_ID', 'SCALAR_FACTOR', 'SCALAR_ID', 'VECTOR', 'COORDINATE',
+                 'VALUE', 'STATUS', 'SYMBOL', 'TERMINATED', 'DECIMALS']
+
+# Columns kept from the StatCan tables; labels repeat on every row, so they are categorical
+_STATCAN_COLUMNS = {
+    'REF_DATE': 'str',
+    'GEO': 'category',
+    'VECTOR': 'category',
+    'VALUE': 'float32',
+    'STATUS': 'category',
+    'SYMBOL': 'category',
+}
+
+SCHEMAS = {
+    'rmpi': {
+        # The RMPI extract carries the monthly date under a BOM-prefixed REF_DATE header
+        # followed by the quarterly REF_DATE label; only the quarterly one is kept
+        'header': ['REF_DATE', 'REF_DATE', 'GEO', 'DGUID', NAPCS] + _STATCAN_TAIL,
+        'columns': {**_STATCAN_COLUMNS, NAPCS: 'category'},
+        'required': ['REF_DATE', 'GEO', NAPCS, 'VECTOR'],
+    },
+    'ippi': {
+        # The IPPI extract has the date first and its quarterly label in 'DataNormal'
+        'header': ['REF_DATE', 'DataNormal', 'GEO', 'DGUID', NAPCS] + _STATCAN_TAIL,
+        'columns': {**_STATCAN_COLUMNS, NAPCS: 'category'},
+        'required': ['REF_DATE', 'GEO', NAPCS, 'VECTOR'],
+    },
+    'gdp': {
+        # 36-10-0434 is not shipped with the repository, so only the columns the
+        # charts rely on are checked; GDP levels in millions need float64 precision
+        'header': None,
+        'columns': {**_STATCAN_COLUMNS, NAICS: 'category', 'VALUE': 'float64'},
+        'required': ['REF_DATE', 'GEO', NAICS, 'VECTOR'],
+    },
+    'cpi': {
+        'header': ['date', 'V41690973', 'V41690914', 'STATIC_TOTALCPICHANGE', 'CPI_TRIM', 'CPI_MEDIAN',
+                   'CPI_COMMON', 'ATOM_V41693242', 'STATIC_CPIXFET', 'CPIW'],
+        'columns': {
+            'date': 'str',
+            'STATIC_TOTALCPICHANGE': 'float32',
+            'CPI_TRIM': 'float32',
+            'CPI_MEDIAN': 'float32',
+            'CPI_COMMON': 'float32',
+        },
+        'required': ['date'],
+    },
+}
+
+
+def check_header(name, header):
+    """Raise SchemaError if a cleaned header differs from the declared layout.
+
+    `header` is the list of column names after whitespace/BOM cleanup, before any
+    duplicate is dropped.
+    """
+    schema = SCHEMAS[name]
+    header = list(header)
+    if schema['header'] is not None and header != schema['header']:
+        missing = [c for c in schema['header'] if c not in header]
+        unexpected = [c for c in header if c not in schema['header']]
+        raise SchemaError(
+            f'{name}: header does not match the declared layout '
+            f'(missing {missing}, unexpected {unexpected}, got {header})'
+        )
+    absent = [c for c in schema['columns'] if c not in header]
+    if absent:
+        raise SchemaError(f'{name}: required columns {absent} are missing from the header')
+
+
+def check_rows(name, df):
+    """Raise SchemaError if a required column has missing values."""
+    nulls = {c: int(n) for c, n in df[SCHEMAS[name]['required']].isna().sum().items() if n}
+    if nulls:
+        raise SchemaError(f'{name}: required columns contain missing values {nulls}')
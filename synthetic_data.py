@@ -0,0 +1,199 @@
+# Synthetic StatCan/Bank of Canada datasets for benchmarking
+# Writes RMPI, IPPI, GDP (36100434) and CPI_MONTHLY files with the same headers, BOM,
+# duplicate/renamed date columns and bracketed NAPCS/NAICS labels as the real extracts,
+# at any size from a few thousand to tens of millions of rows.
+#
+# Usage:
+#     python synthetic_data.py --rows 1000000 --output-dir /tmp/pestel-data
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import SOURCES
+from schemas import NAICS, NAPCS, SCHEMAS
+
+BOM = b'\xef\xbb\xbf'
+
+# 55 years of monthly observations, about the span of the real RMPI extract
+MAX_MONTHS = 12 * 55
+
+GEOS = [
+    ('Atlantic Region', '2021A00011'),
+    ('Quebec', '2021A000224'),
+    ('Ontario', '2021A000235'),
+    ('Prairie Region', '2021A00014'),
+    ('British Columbia', '2021A000259'),
+]
+
+PRODUCTS = [
+    'Finished motor gasoline (except for aircraft, and ethanol fuel) [261211]',
+    'Diesel fuel [261221]',
+    'Jet fuel [261312]',
+    'Light fuel oils (except kerosene and diesel) [261322]',
+    'Crude oil and crude bitumen [161111]',
+    'Natural gas [162111]',
+    'Iron ores and concentrates [151111]',
+    'Copper ores and concentrates [151121]',
+    'Wheat [111111]',
+    'Canola (including rapeseed) [111211]',
+    'Cattle and calves [121111]',
+    'Softwood logs and bolts [141111]',
+]
+
+# Aggregates first, then sectors and sub-sectors whose codes nest inside each other
+INDUSTRIES = [
+    'All industries [T001]',
+    'Goods-producing industries [T002]',
+    'Service-producing industries [T003]',
+    'Business sector industries [T004]',
+    'Mining, quarrying, and oil and gas extraction [21]',
+    'Oil and gas extraction [211]',
+    'Construction [23]',
+    'Manufacturing [31-33]',
+    'Food manufacturing [311]',
+    'Petroleum and coal product manufacturing [324]',
+    'Wholesale trade [41]',
+    'Retail trade [44-45]',
+    'Finance and insurance [52]',
+    'Real estate and rental and leasing [53]',
+    'Health care and social assistance [62]',
+]
+
+
+def _months(n_months, start_year):
+    return pd.period_range(f'{start_year}-01', periods=n_months, freq='M')
+
+
+def _random_walk(rng, n_series, n_periods, start=20.0):
+    steps = rng.normal(0.005, 0.03, size=(n_series, n_periods))
+    return np.round(start * np.exp(np.cumsum(steps, axis=1)), 1)
+
+
+def _series_layout(rows, labels, n_geos):
+    # Spread the requested rows over vectors (label x GEO, repeated if needed) and up to
+    # MAX_MONTHS months; larger tables get more vectors rather than a longer history
+    n_vectors = len(labels) * n_geos
+    n_months = max(4, min(MAX_MONTHS, rows // n_vectors))
+    n_vectors = max(n_vectors, -(-rows // n_months))
+    return n_vectors, n_months
+
+
+def _write_frames(path, header, frames, encoding):
+    with open(path, 'wb') as handle:
+        handle.write(BOM + (','.join(f'"{c}"' if ',' in c else c for c in header) + '\n').encode(encoding))
+        for frame in frames:
+            handle.write(frame.to_csv(header=False, index=False, lineterminator='\n').encode(encoding))
+
+
+def _statcan_frames(rows, labels, label_column, date_columns, start_year, value_start, uom, seed,
+                    extra_columns=(), chunk_rows=500_000):
+    rng = np.random.default_rng(seed)
+    n_vectors, n_months = _series_layout(rows, labels, len(GEOS))
+    months = _months(n_months, start_year)
+    quarter_labels = months.asfreq('Q').astype(str).to_numpy()
+    month_starts = months.to_timestamp().strftime('%Y-%m-%d').to_numpy()
+    month_labels = months.astype(str).to_numpy()
+    vectors_per_chunk = max(1, chunk_rows // n_months)
+    produced = 0
+
+    for first in range(0, n_vectors, vectors_per_chunk):
+        ids = np.arange(first, min(n_vectors, first + vectors_per_chunk))
+        values = _random_walk(rng, len(ids), n_months, value_start).ravel()
+        take = min(len(values), rows - produced)
+        if take <= 0:
+            break
+        vector_index = np.repeat(ids, n_months)[:take]
+        month_index = np.tile(np.arange(n_months), len(ids))[:take]
+        geo = vector_index % len(GEOS)
+        label = (vector_index // len(GEOS)) % len(labels)
+        date_values = {
+            'month_start': month_starts[month_index],
+            'month_label': month_labels[month_index],
+            'quarter_label': quarter_labels[month_index],
+        }
+        frame = {}
+        for column, kind in date_columns:
+            frame[column] = date_values[kind]
+        frame['GEO'] = np.array([g for g, _ in GEOS], dtype=object)[geo]
+        frame['DGUID'] = np.array([d for _, d in GEOS], dtype=object)[geo]
+        for column, value in extra_columns:
+            frame[column] = value
+        frame[label_column] = np.asarray(labels, dtype=object)[label]
+        frame['UOM'] = uom
+        frame['UOM_ID'] = 403
+        frame['SCALAR_FACTOR'] = 'units'
+        frame['SCALAR_ID'] = 0
+        frame['VECTOR'] = np.char.add('v', (1324952500 + vector_index).astype(str))
+        frame['COORDINATE'] = np.char.add(np.char.add((geo + 1).astype(str), '.'), (label + 1).astype(str))
+        frame['VALUE'] = values[:take]
+        frame['STATUS'] = ''
+        frame['SYMBOL'] = ''
+        frame['TERMINATED'] = ''
+        frame['DECIMALS'] = 1
+        produced += take
+        yield pd.DataFrame(frame)
+
+
+def generate(output_dir, rows=10_000, seed=0):
+    """Write all four synthetic sources into `output_dir` and return their paths.
+
+    StatCan tables get roughly `rows` rows each; the monthly CPI file is capped at one
+    row per month since 1900, like the real Bank of Canada series.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    price_uom = 'Index, 202001=100'
+
+    # RMPI: BOM-prefixed monthly REF_DATE followed by the quarterly REF_DATE label
+    paths['rmpi'] = output_dir / SOURCES['rmpi']['file']
+    _write_frames(paths['rmpi'], SCHEMAS['rmpi']['header'], _statcan_frames(
+        rows, PRODUCTS, NAPCS, [('REF_DATE_MONTH', 'month_start'), ('REF_DATE', 'quarter_label')],
+        1971, 5.0, price_uom, seed), 'latin1')
+
+    # IPPI: BOM-prefixed monthly REF_DATE with its quarterly label in DataNormal
+    paths['ippi'] = output_dir / SOURCES['ippi']['file']
+    _write_frames(paths['ippi'], SCHEMAS['ippi']['header'], _statcan_frames(
+        rows, PRODUCTS, NAPCS, [('REF_DATE', 'month_start'), ('DataNormal', 'quarter_label')],
+        1997, 40.0, price_uom, seed + 1), 'latin1')
+
+    # GDP 36-10-0434: monthly REF_DATE labels, chained 2017 dollars by NAICS industry
+    gdp_header = ['REF_DATE', 'GEO', 'DGUID', 'Seasonal adjustment', 'Prices', NAICS,
+                  'UOM', 'UOM_ID', 'SCALAR_FACTOR', 'SCALAR_ID', 'VECTOR', 'COORDINATE',
+                  'VALUE', 'STATUS', 'SYMBOL', 'TERMINATED', 'DECIMALS']
+    paths['gdp'] = output_dir / SOURCES['gdp']['file']
+    _write_frames(paths['gdp'], gdp_header, _statcan_frames(
+        rows, INDUSTRIES, NAICS, [('REF_DATE', 'month_label')], 1997, 50_000.0, 'Chained (2017) dollars',
+        seed + 2, extra_columns=[('Seasonal adjustment', 'Seasonally adjusted at annual rates'),
+                                 ('Prices', 'Chained (2017) dollars')]), 'latin1')
+
+    # CPI_MONTHLY: one row per month with the Bank of Canada measures
+    rng = np.random.default_rng(seed + 3)
+    n_months = min(rows, 12 * (2025 - 1900))
+    months = _months(n_months, 2025 - n_months // 12)
+    cpi = pd.DataFrame({'date': months.to_timestamp().strftime('%Y-%m-%d')})
+    level = _random_walk(rng, 1, n_months, 80.0)[0]
+    for column in SCHEMAS['cpi']['header'][1:]:
+        if column.startswith('V4'):
+            cpi[column] = level
+        else:
+            cpi[column] = np.round(rng.normal(2.0, 1.0, n_months), 1)
+    paths['cpi'] = output_dir / SOURCES['cpi']['file']
+    _write_frames(paths['cpi'], SCHEMAS['cpi']['header'], [cpi], 'utf-8')
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate StatCan-shaped synthetic datasets.')
+    parser.add_argument('--rows', type=int, default=10_000, help='approximate rows per StatCan table')
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name, path in generate(args.output_dir, args.rows, args.seed).items():
+        print(f'{name:<5} {path}')
+
+
+if __name__ == '__main__':
+    main()
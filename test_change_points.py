@@ -0,0 +1,83 @@
+# CUSUM break detection and the crisis windows built from the breaks
+import numpy as np
+import pytest
+
+from change_points import ChangePointDetector
+
+
+def _with_breaks(flagged, quarters=20, first=100):
+    # Detector whose per-quarter totals flag exactly the given quarters (all series break)
+    detector = ChangePointDetector()
+    detector.first_quarter = first
+    detector.observed_per_quarter = np.full(quarters, 4, dtype=np.int64)
+    detector.breaks_per_quarter = np.zeros(quarters, dtype=np.int64)
+    detector.breaks_per_quarter[[q - first for q in flagged]] = 4
+    return detector
+
+
+@pytest.mark.parametrize('flagged, min_width, expected', [
+    ([], 6, []),
+    ([102], 6, [(102, 107)]),
+    ([102], 1, [(102, 102)]),
+    # Windows reaching into each other, or one quiet quarter apart, are merged
+    ([102, 105], 6, [(102, 110)]),
+    ([102, 109], 6, [(102, 114)]),
+    ([102, 110], 6, [(102, 107), (110, 115)]),
+    ([102, 104], 1, [(102, 104)]),
+    ([102, 105], 1, [(102, 102), (105, 105)]),
+    # A window never runs past the last processed quarter
+    ([117], 6, [(117, 119)]),
+])
+def test_intervals_merge_and_minimum_width(flagged, min_width, expected):
+    assert _with_breaks(flagged).intervals(min_width=min_width) == expected
+
+
+def test_intervals_use_the_share_of_observed_series():
+    detector = _with_breaks([103])
+    detector.breaks_per_quarter[8] = 1
+    assert detector.intervals(min_share=0.25, min_width=1) == [(103, 103), (108, 108)]
+    assert detector.intervals(min_share=0.5, min_width=1) == [(103, 103)]
+
+
+def test_jump_is_detected_once_per_series():
+    detector = ChangePointDetector()
+    labels = ['v1', 'v2', 'v3']
+    levels = np.array([100.0, 50.0, 80.0])
+    for quarter in range(8000, 8020):
+        wiggle = 1 + 0.002 * (-1) ** quarter
+        step = np.array([1.3, 0.7, 1.0]) if quarter == 8012 else 1.0
+        levels = levels * 1.01 * wiggle * step
+        detector.update(quarter, levels, labels)
+
+    breaks = detector.break_dates()
+    assert breaks[['series', 'QUARTER', 'direction']].values.tolist() == [['v1', 8012, 'up'], ['v2', 8012, 'down']]
+    assert detector.intervals(min_width=4) == [(8012, 8015)]
+
+
+def test_quarters_are_processed_once():
+    detector = ChangePointDetector()
+    detector.update(8000, [1.0], ['v1'])
+    with pytest.raises(ValueError, match='already processed'):
+        detector.update(8000, [1.0], ['v1'])
+
+
+def test_saved_state_continues_like_the_original(tmp_path):
+    rng = np.random.default_rng(0)
+    levels = 100 * np.cumprod(1 + rng.normal(0.01, 0.02, (40, 6)), axis=0)
+    levels[25:, :3] *= 1.5
+    labels = [f'v{i}' for i in range(6)]
+
+    whole = ChangePointDetector()
+    resumed = ChangePointDetector()
+    for quarter, row in enumerate(levels):
+        whole.update(quarter, row, labels)
+        if quarter == 19:
+            resumed.update(quarter, row, labels)
+            resumed.save(tmp_path / 'breaks.npz')
+            resumed = ChangePointDetector.load(tmp_path / 'breaks.npz')
+        else:
+            resumed.update(quarter, row, labels)
+
+    assert len(whole.break_dates())
+    assert resumed.break_dates().equals(whole.break_dates())
+    assert resumed.intervals() == whole.intervals()
@@ -0,0 +1,126 @@
+# Request handling of the chart server: ETags, the response and dataset caches, errors
+# Rendering is replaced by a fixed body, so these tests need none of the dataset files.
+import asyncio
+
+import pytest
+
+import chart_server
+import pipeline
+from chart_server import ChartService, RequestError, parse_windows
+from quarters import to_ordinal
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = ChartService(charts=['Grafico2', 'Grafico10'], cache_bytes=1 << 20)
+    rendered = []
+
+    def produce(kind, name, fmt, values):
+        rendered.append((kind, name, fmt, values))
+        return f'{name}.{fmt} {sorted(values.items())}'.encode()
+
+    monkeypatch.setattr(service, 'produce', produce)
+    service.rendered = rendered
+    yield service
+    service.close()
+
+
+def _get(service, target, headers=None):
+    return asyncio.run(service.respond('GET', target, headers or {}))
+
+
+def _error(service, target, method='GET'):
+    with pytest.raises(RequestError) as caught:
+        asyncio.run(service.respond(method, target, {}))
+    return caught.value.status
+
+
+def test_repeated_request_is_served_from_cache(service):
+    status, headers, body = _get(service, '/charts/Grafico2.svg?top_n=8')
+    assert (status, headers['X-Cache'], headers['Content-Type']) == (200, 'miss', 'image/svg+xml')
+    again = _get(service, '/charts/Grafico2.svg?top_n=8')
+    assert again[0] == 200 and again[1]['X-Cache'] == 'hit' and again[2] == body
+    assert again[1]['ETag'] == headers['ETag']
+    assert len(service.rendered) == 1
+    assert service.rendered[0][3] == {'top_n': 8}
+
+
+def test_matching_etag_revalidates_without_rendering(service):
+    etag = _get(service, '/data/Grafico2.json')[1]['ETag']
+    service._cache = chart_server._SizedCache(service.cache_bytes)
+    status, headers, body = _get(service, '/data/Grafico2.json', {'if-none-match': f'"other", {etag}'})
+    assert (status, body, headers['ETag']) == (304, b'', etag)
+    assert len(service.rendered) == 1
+
+
+def test_parameters_change_the_etag(service):
+    first = _get(service, '/charts/Grafico2.png?top_n=3')[1]['ETag']
+    assert _get(service, '/charts/Grafico2.png?top_n=4')[1]['ETag'] != first
+
+
+@pytest.mark.parametrize('query', ['top_n=-1', 'top_n=0', 'top_n=two', 'colour=red'])
+def test_invalid_parameters_are_rejected(service, query):
+    assert _error(service, f'/charts/Grafico2.png?{query}') == 400
+    assert service.rendered == []
+
+
+def test_crisis_windows_are_validated(service):
+    assert _error(service, '/data/Grafico10.json?crises=2010Q1-2008Q1') == 400
+    assert _error(service, '/data/Grafico10.json?min_share=1.5') == 400
+    assert _error(service, '/data/Grafico10.json?start_year=-5') == 400
+    assert _get(service, '/data/Grafico10.json?crises=2008Q3-2010Q4')[0] == 200
+
+
+@pytest.mark.parametrize('target', ['/charts/Grafico99.png', '/charts/Grafico2.gif', '/data/Grafico2.png', '/other'])
+def test_unknown_endpoints_are_not_found(service, target):
+    assert _error(service, target) == 404
+
+
+def test_only_get_and_head_are_allowed(service):
+    assert _error(service, '/charts/Grafico2.png', method='POST') == 405
+
+
+def test_missing_dataset_is_not_found(service, monkeypatch):
+    def produce(kind, name, fmt, values):
+        raise FileNotFoundError('36100434.csv')
+
+    monkeypatch.setattr(service, 'produce', produce)
+    assert _error(service, '/charts/Grafico2.png') == 404
+
+
+def test_response_cache_is_bounded():
+    cache = chart_server._SizedCache(100)
+    for i in range(5):
+        cache.put(i, b'x' * 40, 40)
+    assert len(cache) == 2 and cache.bytes == 80
+    assert cache.get(0) is None and cache.get(4) == b'x' * 40
+    cache.put('large', b'y' * 500, 500)
+    assert len(cache) == 1 and cache.get('large') is not None
+
+
+def test_datasets_with_parameters_share_the_cache_bound():
+    # Computed by the real pipeline, whose own memo and step files must not grow per variant
+    service = ChartService(charts=['Grafico3'], cache_bytes=20_000)
+    try:
+        default = service.dataset('cpi_quarterly', {})
+        # The first variant may memoize the parameter-free source table it is computed from
+        service.dataset('cpi_quarterly', {'start_year': 1989})
+        memoized, files = len(pipeline._MEMORY), sorted(pipeline.STEP_DIR.glob('*.arrow'))
+        frames = {year: service.dataset('cpi_quarterly', {'start_year': year}) for year in range(1990, 2030)}
+        assert service.dataset('cpi_quarterly', {}) is default
+        assert len(pipeline._MEMORY) == memoized
+        assert sorted(pipeline.STEP_DIR.glob('*.arrow')) == files
+        assert 0 < len(service._variants) < 40 and service._variants.bytes <= 20_000
+        assert service.dataset('cpi_quarterly', {'start_year': 2029}) is frames[2029]
+        assert frames[2005]['QUARTER'].min() >= to_ordinal(2005)
+    finally:
+        service.close()
+
+
+def test_parse_windows():
+    assert parse_windows('') == ()
+    windows = parse_windows('2008Q3-2010Q4, 2020Q1-2021Q4')
+    assert [label for _, _, label in windows] == ['2008Q3–2010Q4', '2020Q1–2021Q4']
+    assert windows[0][0] < windows[0][1] < windows[1][0]
+    with pytest.raises(ValueError):
+        parse_windows('2008Q3')
@@ -0,0 +1,91 @@
+# Parent linking and roll-ups of the NAICS/NAPCS classification tree
+import numpy as np
+import pandas as pd
+import pytest
+
+from hierarchy import Hierarchy
+
+LABELS = ['All industries [T001]', 'Manufacturing [31-33]', 'Food manufacturing [311]', 'Meat [3116]',
+          'Beef [31161]', 'Bakeries [3118]', 'Mining [21]', 'Special aggregate [abc]', 'No code']
+
+NAN = np.nan
+
+
+def _tree(total=(NAN, NAN), meat=(NAN, NAN)):
+    values = np.array([
+        total,          # All industries
+        [NAN, NAN],     # Manufacturing
+        [NAN, NAN],     # Food manufacturing
+        meat,           # Meat
+        [10.0, 12.0],   # Beef
+        [5.0, NAN],     # Bakeries
+        [20.0, 25.0],   # Mining
+        [1.0, 1.0],     # Special aggregate
+        [NAN, NAN],     # No code
+    ])
+    return Hierarchy(LABELS, values, quarters=[8000, 8001])
+
+
+def test_parents_follow_code_prefixes_and_ranges():
+    tree = Hierarchy(LABELS)
+    assert tree.parent('Beef [31161]') == 'Meat [3116]'
+    assert tree.parent('Meat [3116]') == 'Food manufacturing [311]'
+    assert tree.parent('Bakeries [3118]') == 'Food manufacturing [311]'
+    assert tree.parent('Food manufacturing [311]') == 'Manufacturing [31-33]'
+    for root in ('Manufacturing [31-33]', 'Mining [21]', 'All industries [T001]', 'No code'):
+        assert tree.parent(root) is None
+    assert tree.children('Food manufacturing [311]') == ['Meat [3116]', 'Bakeries [3118]']
+    assert tree.leaves() == ['Beef [31161]', 'Bakeries [3118]', 'Mining [21]']
+    assert tree.depths.tolist() == [0, 1, 2, 3, 4, 3, 1, 0, 0]
+
+
+def test_nodes_are_found_by_label_code_or_name():
+    tree = Hierarchy(LABELS)
+    assert tree.node('311') == tree.node('Food manufacturing') == tree.node('Food manufacturing [311]') == 2
+    with pytest.raises(KeyError):
+        tree.node('999')
+
+
+def test_children_are_summed_only_where_a_node_has_no_value():
+    tree = _tree(meat=(11.0, NAN))
+    np.testing.assert_array_equal(tree.series('Meat [3116]'), [11.0, 12.0])
+    np.testing.assert_array_equal(tree.series('Food manufacturing [311]'), [16.0, 12.0])
+    np.testing.assert_array_equal(tree.series('Manufacturing [31-33]'), [16.0, 12.0])
+    # Aggregates outside the tree are never added to it
+    np.testing.assert_array_equal(tree.total(), [36.0, 37.0])
+
+
+def test_published_total_wins():
+    tree = _tree(total=(40.0, NAN))
+    np.testing.assert_array_equal(tree.total(), [40.0, 37.0])
+
+
+def test_rankings():
+    tree = _tree()
+    assert tree.top(2, depth=1) == ['Mining [21]', 'Manufacturing [31-33]']
+    assert tree.top(1, depth=3) == ['Meat [3116]']
+    assert tree.top_leaves(2) == ['Mining [21]', 'Beef [31161]']
+    assert tree.top(5, depth=9) == []
+
+
+def test_values_are_required_for_rankings():
+    with pytest.raises(ValueError):
+        Hierarchy(LABELS).top(3)
+
+
+def test_from_frame_matches_groupby_sums():
+    rng = np.random.default_rng(0)
+    rows = 400
+    df = pd.DataFrame({
+        'SECTOR': rng.choice(LABELS[1:], rows),
+        'QUARTER': rng.integers(8000, 8006, rows),
+        'VALUE': np.where(rng.random(rows) < 0.1, NAN, rng.normal(50, 10, rows)),
+    })
+    tree = Hierarchy.from_frame(df, 'SECTOR')
+    sums = df.dropna().groupby(['SECTOR', 'QUARTER'])['VALUE'].sum().unstack()
+    for label in ('Beef [31161]', 'Mining [21]', 'No code'):
+        np.testing.assert_allclose(tree.series(label), sums.loc[label].reindex(tree.quarters).to_numpy())
+    # Published values are kept: Food manufacturing has its own rows here
+    np.testing.assert_allclose(tree.series('Food manufacturing [311]'),
+                               sums.loc['Food manufacturing [311]'].reindex(tree.quarters).to_numpy())
+    np.testing.assert_allclose(tree.total(), sums.loc[['Manufacturing [31-33]', 'Mining [21]']].sum().to_numpy())
@@ -0,0 +1,76 @@
+# Checks parallel_agg() against the pandas groupby it replaces
+import numpy as np
+import pandas as pd
+import pytest
+
+import parallel_groupby
+from parallel_groupby import AGGREGATIONS, parallel_agg
+
+
+def _frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    products = pd.Categorical.from_codes(rng.integers(-1, 40, rows), categories=[f'P{i:02d}' for i in range(45)])
+    values = rng.normal(100, 20, rows)
+    values[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'QUARTER': rng.integers(7980, 8100, rows).astype(np.int32),
+        'PRODUCT': products,
+        'GEO': rng.choice(['Canada', 'Quebec', 'Ontario'], rows),
+        'VALUE': values.astype(np.float32),
+    })
+
+
+def _expected(df, by):
+    grouped = df.dropna(subset=['VALUE']).groupby(by, observed=True, sort=True)['VALUE']
+    return grouped.agg(AGGREGATIONS).reset_index()
+
+
+@pytest.mark.parametrize('by', [['QUARTER'], ['PRODUCT'], ['GEO'], ['QUARTER', 'PRODUCT'], ['PRODUCT', 'GEO', 'QUARTER']])
+def test_matches_pandas_groupby(by):
+    df = _frame(50_000)
+    result = parallel_agg(df, by, aggs=AGGREGATIONS, min_rows=0)
+    pd.testing.assert_frame_equal(result, _expected(df, by), check_dtype=False, rtol=1e-6)
+    for key in by:
+        assert result[key].dtype == df[key].dtype
+
+
+def test_small_inputs_use_pandas():
+    df = _frame(500)
+    pd.testing.assert_frame_equal(parallel_agg(df, ['QUARTER', 'PRODUCT'], aggs=['mean', 'count']),
+                                  _expected(df, ['QUARTER', 'PRODUCT'])[['QUARTER', 'PRODUCT', 'mean', 'count']])
+
+
+def test_worker_processes_match_single_process(monkeypatch):
+    df = _frame(30_000, seed=1)
+    single = parallel_agg(df, ['QUARTER', 'PRODUCT'], aggs=AGGREGATIONS, workers=1, min_rows=0)
+    slices = []
+    partials = parallel_groupby._parallel_partials
+
+    def counted(codes, values, sizes, workers):
+        slices.append(workers)
+        return partials(codes, values, sizes, workers)
+
+    monkeypatch.setattr(parallel_groupby, '_parallel_partials', counted)
+    split = parallel_agg(df, ['QUARTER', 'PRODUCT'], aggs=AGGREGATIONS, workers=3, min_rows=0, parallel_rows=0)
+    pd.testing.assert_frame_equal(split, single)
+    assert slices == [3]
+
+
+def test_default_workers_stay_in_process_on_few_cores(monkeypatch):
+    monkeypatch.setattr(parallel_groupby.os, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(parallel_groupby, '_parallel_partials', None)
+    df = _frame(20_000)
+    pd.testing.assert_frame_equal(parallel_agg(df, 'QUARTER', aggs=AGGREGATIONS, min_rows=0, parallel_rows=0),
+                                  _expected(df, ['QUARTER']), check_dtype=False, rtol=1e-6)
+
+
+def test_all_values_missing():
+    df = _frame(20_000).assign(VALUE=np.nan)
+    result = parallel_agg(df, 'QUARTER', aggs=['sum'], min_rows=0)
+    assert result.empty
+    assert list(result.columns) == ['QUARTER', 'sum']
+
+
+def test_unknown_aggregation():
+    with pytest.raises(ValueError, match='median'):
+        parallel_agg(_frame(100), 'QUARTER', aggs=['median'])
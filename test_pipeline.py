@@ -0,0 +1,50 @@
+# In-process memo of the pipeline steps: reuse and least-recently-used eviction
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+import pipeline
+from pipeline import compute, step_key
+
+
+@pytest.fixture
+def memo(monkeypatch):
+    # A private memo, so the tests neither see nor drop the outputs of other tests
+    monkeypatch.setattr(pipeline, '_MEMORY', OrderedDict())
+    monkeypatch.setattr(pipeline, '_memory_bytes', 0)
+    return pipeline._MEMORY
+
+
+def _frame(rows):
+    return pd.DataFrame({'VALUE': range(rows)})
+
+
+def test_oldest_output_is_evicted_past_the_limit(memo, monkeypatch):
+    size = int(_frame(100).memory_usage(deep=True).sum())
+    monkeypatch.setattr(pipeline, 'MAX_CACHE_BYTES', 3 * size)
+    for key in 'abc':
+        pipeline._remember(key, _frame(100))
+    assert pipeline._recall('a') is not None
+    pipeline._remember('d', _frame(100))
+    assert list(memo) == ['c', 'a', 'd']
+    assert pipeline._memory_bytes == 3 * size
+    assert pipeline._recall('b') is None
+
+
+def test_output_larger_than_the_limit_is_kept_alone(memo, monkeypatch):
+    monkeypatch.setattr(pipeline, 'MAX_CACHE_BYTES', 10)
+    pipeline._remember('a', _frame(10))
+    pipeline._remember('b', _frame(1000))
+    assert list(memo) == ['b']
+
+
+def test_compute_reuses_and_evicts_memoized_outputs(memo, monkeypatch):
+    first = compute('cpi_quarterly', start_year=2000)
+    assert compute('cpi_quarterly', start_year=2000) is first
+    assert step_key('cpi_quarterly', start_year=2000) in memo
+
+    monkeypatch.setattr(pipeline, 'MAX_CACHE_BYTES', 0)
+    second = compute('cpi_quarterly', start_year=2001)
+    assert list(memo) == [step_key('cpi_quarterly', start_year=2001)]
+    pd.testing.assert_frame_equal(second, first[first['QUARTER'] >= second['QUARTER'].min()].reset_index(drop=True))
@@ -0,0 +1,26 @@
+# Lazy queries against the same filters applied to the loaded table with pandas
+import operator
+
+import pytest
+
+from data_loader import load_dataset
+from query import col, rmpi
+
+
+@pytest.fixture(scope='module')
+def table():
+    return load_dataset('rmpi')
+
+
+@pytest.mark.parametrize('compare', [operator.gt, operator.ge, operator.lt, operator.le, operator.eq])
+@pytest.mark.parametrize('bound', [7990.5, 7990, 8000.25])
+def test_quarter_bounds_match_pandas(table, compare, bound):
+    # Non-integer bounds on the integer quarter key must round the right way
+    result = rmpi().where(compare(col('QUARTER'), bound)).collect()
+    assert len(result) == int(compare(table['QUARTER'], bound).sum())
+
+
+def test_non_numeric_bounds_stay_per_chunk_filters():
+    plan = rmpi().where(col('QUARTER') > '7990', col('QUARTER') >= 7990.5).explain()
+    assert 'QUARTER between: 7991 and None' in plan
+    assert 'per-chunk filter' in plan and "'7990'" in plan
@@ -0,0 +1,19 @@
+# Selection of the most volatile series
+import numpy as np
+
+from volatility import top_k
+
+
+def test_top_k_matches_a_full_stable_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        scores = rng.integers(0, 4, rng.integers(0, 30)).astype(float)
+        scores[rng.random(len(scores)) < 0.2] = np.nan
+        k = int(rng.integers(0, 35))
+        expected = np.lexsort((np.arange(len(scores)), -np.nan_to_num(scores, nan=-np.inf)))[:k]
+        np.testing.assert_array_equal(top_k(scores, k), expected)
+
+
+def test_ties_at_the_cut_keep_position_order():
+    scores = np.array([1.0, 5.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 0.0])
+    assert top_k(scores, 4).tolist() == [1, 2, 3, 4]
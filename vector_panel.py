@@ -0,0 +1,167 @@
+# Dense VECTOR x quarter panel for the RMPI/IPPI price series
+# The long format repeats GEO, DGUID, the NAPCS label, UOM and COORDINATE on every row.
+# Here each StatCan vector becomes one row of a float32 matrix over a contiguous quarter
+# axis (NaN for gaps), with the descriptive fields kept once per vector in a side table.
+# Both matrices are stored as .npy files and memory-mapped on load.
+import numpy as np
+import pandas as pd
+
+from classify import label_code
+from data_loader import CACHE_DIR, NAPCS, dataset_fingerprint, feather, frame_metadata, read_frame, save_frame
+from price_cube import load_cube
+from profiling import stage
+from quarters import quarter_to_timestamp
+
+# Bump whenever the stored layout changes so stale panels are rebuilt
+PANEL_VERSION = 2
+
+
+class VectorPanel:
+    """Mean value and observation count per (vector, quarter).
+
+    `values` is float32 (n_vectors, n_quarters) with NaN where a vector has no data,
+    `counts` holds the number of source rows behind each cell so that pooled means
+    across vectors match the row-level groupby().mean() of the charts, `quarters` is
+    the contiguous int quarter axis and `meta` has one row per vector (VECTOR, GEO,
+    NAPCS label and code, and the lowest and highest value of its source rows).
+    """
+
+    def __init__(self, values, counts, quarters, meta):
+        self.values = values
+        self.counts = counts
+        self.quarters = np.asarray(quarters)
+        self.meta = meta.reset_index(drop=True)
+
+    @classmethod
+    def from_cube(cls, cube):
+        """Pivot a PriceCube (one cell per vector and quarter) into the dense layout."""
+        cells = cube.cells
+        vectors, vector_index = np.unique(cells['VECTOR'].astype(str).to_numpy(), return_inverse=True)
+        first, last = int(cells['QUARTER'].min()), int(cells['QUARTER'].max())
+        quarters = np.arange(first, last + 1, dtype=np.int32)
+        column = cells['QUARTER'].to_numpy() - first
+
+        sums = np.zeros((len(vectors), len(quarters)), dtype=np.float64)
+        counts = np.zeros((len(vectors), len(quarters)), dtype=np.uint16)
+        sums[vector_index, column] = cells['sum'].to_numpy()
+        counts[vector_index, column] = cells['count'].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+
+        meta = (cells.assign(VECTOR=cells['VECTOR'].astype(str))
+                .drop_duplicates('VECTOR').set_index('VECTOR').loc[vectors, ['GEO', NAPCS]].reset_index())
+        meta['code'] = meta[NAPCS].map(label_code)
+        # Row-level extremes, which quarterly means smooth out (the range ranking of the cube)
+        extremes = cells.groupby(cells['VECTOR'].astype(str), sort=True).agg({'min': 'min', 'max': 'max'})
+        meta[['min', 'max']] = extremes.loc[vectors].to_numpy()
+        return cls(values, counts, quarters, meta)
+
+    # === REDUCTIONS ===
+    def group_index(self, by=NAPCS):
+        """Group labels in first-seen order and the group number of every vector."""
+        codes, labels = pd.factorize(self.meta[by])
+        return list(labels), codes
+
+    def group_mean(self, by=NAPCS, groups=None):
+        """Pooled mean per quarter for each group of vectors -> (labels, (n_groups, n_quarters)).
+
+        Cell means are weighted by their row counts, so the result equals the mean over
+        all source rows of the group in each quarter (NaN where a group has no data).
+        """
+        labels, codes = self.group_index(by)
+        weighted = np.nan_to_num(self.values.astype(np.float64)) * self.counts
+        sums = np.zeros((len(labels), len(self.quarters)))
+        totals = np.zeros_like(sums)
+        np.add.at(sums, codes, weighted)
+        np.add.at(totals, codes, self.counts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / totals
+        if groups is not None:
+            rows = [labels.index(group) for group in groups]
+            return list(groups), means[rows]
+        return labels, means
+
+    def group_range(self, by=NAPCS):
+        """Max - min over all source rows of each group -> (labels, ranges)."""
+        labels, codes = self.group_index(by)
+        low = np.full(len(labels), np.inf)
+        high = np.full(len(labels), -np.inf)
+        np.minimum.at(low, codes, self.meta['min'].to_numpy(dtype=np.float64))
+        np.maximum.at(high, codes, self.meta['max'].to_numpy(dtype=np.float64))
+        return labels, high - low
+
+    def facet_mean(self, facet='GEO', by=NAPCS, facets=None, groups=None):
+        """group_mean() within each facet -> (facet labels, labels, (n_facets, n_groups, n_quarters)).
+
+        `facets` and `groups` select and order the facet and group labels (default: all,
+        in first-seen order); vectors outside the selection are ignored.
+        """
+        facet_labels, facet_codes = self.group_index(facet)
+        labels, codes = self.group_index(by)
+        # Re-number the selected facets/groups 0..n-1 and drop the other vectors
+        if facets is not None:
+            facet_codes = pd.Index(list(facets)).get_indexer(np.asarray(facet_labels, dtype=object)[facet_codes])
+            facet_labels = list(facets)
+        if groups is not None:
+            codes = pd.Index(list(groups)).get_indexer(np.asarray(labels, dtype=object)[codes])
+            labels = list(groups)
+        keep = (facet_codes >= 0) & (codes >= 0)
+        weighted = np.nan_to_num(self.values[keep].astype(np.float64)) * self.counts[keep]
+        sums = np.zeros((len(facet_labels), len(labels), len(self.quarters)))
+        totals = np.zeros_like(sums)
+        np.add.at(sums, (facet_codes[keep], codes[keep]), weighted)
+        np.add.at(totals, (facet_codes[keep], codes[keep]), self.counts[keep])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return facet_labels, labels, sums / totals
+
+    def to_long(self, labels, matrix, by=NAPCS, value='VALUE'):
+        """Long ['QUARTER', by, value] frame (gaps dropped) for plotting a group matrix."""
+        frame = pd.DataFrame({
+            'QUARTER': np.tile(self.quarters, len(labels)),
+            by: np.repeat(np.asarray(labels, dtype=object), len(self.quarters)),
+            value: np.asarray(matrix, dtype=np.float64).ravel(),
+        })
+        return frame.dropna(subset=[value]).sort_values(['QUARTER', by], kind='stable', ignore_index=True)
+
+    def timestamps(self):
+        """Quarter-start timestamps of the quarter axis, for plotting."""
+        return quarter_to_timestamp(self.quarters)
+
+    # === STORAGE ===
+    def save(self, prefix, metadata=None):
+        """Write <prefix>.values.npy, <prefix>.counts.npy and the <prefix>.meta.arrow side table."""
+        prefix = str(prefix)
+        np.save(prefix + '.values.npy', self.values)
+        np.save(prefix + '.counts.npy', self.counts)
+        quarters = {'first_quarter': str(int(self.quarters[0])), 'n_quarters': str(len(self.quarters))}
+        save_frame(self.meta, prefix + '.meta.arrow', metadata={**quarters, **(metadata or {})})
+
+    @classmethod
+    def load(cls, prefix):
+        """Memory-map a panel written by save()."""
+        prefix = str(prefix)
+        metadata = frame_metadata(prefix + '.meta.arrow')
+        first = int(metadata['first_quarter'])
+        quarters = np.arange(first, first + int(metadata['n_quarters']), dtype=np.int32)
+        values = np.load(prefix + '.values.npy', mmap_mode='r')
+        counts = np.load(prefix + '.counts.npy', mmap_mode='r')
+        return cls(values, counts, quarters, read_frame(prefix + '.meta.arrow'))
+
+
+def load_panel(name):
+    """Return the memory-mapped panel for 'rmpi' or 'ippi', rebuilt only when the CSV changes."""
+    prefix = CACHE_DIR / f'{name}.panel'
+    expected = {'panel_version': str(PANEL_VERSION), 'source_sha256': dataset_fingerprint(name)}
+    if feather is not None:
+        metadata = frame_metadata(str(prefix) + '.meta.arrow') or {}
+        if all(metadata.get(k) == v for k, v in expected.items()):
+            return VectorPanel.load(prefix)
+
+    cube = load_cube(name)
+    with stage(f'{name}.panel_build', rows_in=len(cube.cells)) as measured:
+        panel = VectorPanel.from_cube(cube)
+        measured.rows_out = len(panel.meta)
+    if feather is not None:
+        panel.save(prefix, metadata=expected)
+        return VectorPanel.load(prefix)
+    return panel
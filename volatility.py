@@ -0,0 +1,141 @@
+# Vectorized volatility analytics for the RMPI/IPPI price series
+# Works on (n_series, n_quarters) matrices with NaN gaps, such as VectorPanel.values or
+# the per-product matrix from VectorPanel.group_mean(), and computes every metric for
+# all series at once with NumPy reductions along the quarter axis.
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from data_loader import NAPCS
+
+METRICS = ['range', 'std', 'cv', 'max_drawdown', 'rolling_vol', 'peak_rolling_vol']
+
+# Rankings of top_volatile(): the row-level range plus every metric of the quarterly series
+RANKINGS = ['row_range', *METRICS]
+
+
+def forward_fill(matrix):
+    """Carry the last observed value across NaN gaps along each row (leading NaN stay NaN)."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    observed = ~np.isnan(matrix)
+    positions = np.where(observed, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], positions]
+    filled[np.cumsum(observed, axis=1) == 0] = np.nan
+    return filled
+
+
+def quarterly_returns(matrix):
+    """Quarter-over-quarter relative change, NaN where the later quarter is missing."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    filled = forward_fill(matrix)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        changes = filled[:, 1:] / filled[:, :-1] - 1
+    changes[np.isnan(matrix[:, 1:])] = np.nan
+    return changes
+
+
+def rolling_volatility(matrix, window=4, min_periods=None):
+    """Rolling standard deviation of quarterly returns over `window` quarters.
+
+    Uses cumulative sums of x and x**2 so the cost is independent of the window size.
+    The result has the same shape as `matrix`; the first column is always NaN.
+    """
+    min_periods = window if min_periods is None else min_periods
+    changes = quarterly_returns(matrix)
+    valid = ~np.isnan(changes)
+    x = np.where(valid, changes, 0.0)
+
+    def window_sum(values):
+        totals = np.cumsum(values, axis=1, dtype=np.float64)
+        shifted = np.zeros_like(totals)
+        shifted[:, window:] = totals[:, :-window]
+        return totals - shifted
+
+    n = window_sum(valid)
+    s1 = window_sum(x)
+    s2 = window_sum(x * x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (s2 - s1 * s1 / n) / (n - 1)
+    volatility = np.sqrt(np.clip(variance, 0, None))
+    volatility[(n < max(min_periods, 2))] = np.nan
+    return np.hstack([np.full((volatility.shape[0], 1), np.nan), volatility])
+
+
+def max_drawdown(matrix):
+    """Largest peak-to-trough decline of each series as a positive fraction (0.4 = -40%)."""
+    filled = forward_fill(matrix)
+    peaks = np.fmax.accumulate(filled, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdowns = 1 - filled / peaks
+    return _nan_reduce(np.nanmax, drawdowns)
+
+
+def _nan_reduce(reduce, matrix, **kwargs):
+    # NumPy warns on all-NaN rows; those rows simply yield NaN here
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return reduce(matrix, axis=1, **kwargs)
+
+
+def volatility_metrics(matrix, labels=None, window=4):
+    """Every volatility metric for every series of `matrix`, one row per series.
+
+    range is max - min, std the sample standard deviation of the levels, cv the std
+    divided by the absolute mean, max_drawdown the largest peak-to-trough fall,
+    rolling_vol the latest and peak_rolling_vol the highest `window`-quarter
+    standard deviation of quarterly returns.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    mean = _nan_reduce(np.nanmean, matrix)
+    std = _nan_reduce(np.nanstd, matrix, ddof=1)
+    rolling = rolling_volatility(matrix, window)
+    last_observed = forward_fill(rolling)[:, -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cv = std / np.abs(mean)
+    metrics = pd.DataFrame({
+        'range': _nan_reduce(np.nanmax, matrix) - _nan_reduce(np.nanmin, matrix),
+        'std': std,
+        'cv': cv,
+        'max_drawdown': max_drawdown(matrix),
+        'rolling_vol': last_observed,
+        'peak_rolling_vol': _nan_reduce(np.nanmax, rolling),
+    }, index=labels)
+    return metrics
+
+
+def top_k(scores, k):
+    """Positions of the `k` largest scores, largest first, ties in position order (NaN last).
+
+    np.argpartition finds the k-th largest score in linear time. It picks arbitrary
+    positions among scores equal to that one, so the selection is redone from it: every
+    larger score, then the first equal ones by position. Only those k are sorted.
+    """
+    scores = np.where(np.isnan(scores), -np.inf, np.asarray(scores, dtype=np.float64))
+    k = min(k, len(scores))
+    if k == 0:
+        return np.array([], dtype=np.intp)
+    cut = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > cut)
+    candidates = np.concatenate([above, np.flatnonzero(scores == cut)[:k - len(above)]])
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def top_volatile(panel, k=5, metric='row_range', by=NAPCS, window=4):
+    """Labels of the `k` most volatile groups of a VectorPanel by the given metric.
+
+    'row_range' ranks groups (products by default) by max - min over their source rows,
+    like PriceCube.top_by_range(), ties in label order. Any of METRICS instead ranks each
+    group's pooled quarterly mean series, i.e. the line Grafico2 and Grafico4 plot.
+    """
+    if metric not in RANKINGS:
+        raise ValueError(f'unknown volatility metric {metric!r}; expected one of {RANKINGS}')
+    if metric == 'row_range':
+        labels, scores = panel.group_range(by)
+        # Sorting the groups by label first makes ties rank in label order
+        order = np.argsort(np.asarray(labels, dtype=str), kind='stable')
+        return [labels[order[i]] for i in top_k(scores[order], k)]
+    labels, matrix = panel.group_mean(by)
+    metrics = volatility_metrics(matrix, labels, window)
+    return [labels[i] for i in top_k(metrics[metric].to_numpy(), k)]